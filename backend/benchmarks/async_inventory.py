@@ -0,0 +1,187 @@
+"""
+Inventory API throughput with async routes versus the former sync ones.
+
+Serves a database of --items items with Uvicorn twice: once with
+main:app, whose inventory routes run on the event loop with an
+AsyncSession, and once with the same routes as sync handlers on a Session
+(FastAPI runs those on its thread pool, 40 threads by default). For each
+--clients level, that many concurrent HTTP clients send GET
+/inventory/{id}, with --write-ratio of them POST /stock/transaction/
+instead, for --duration seconds. Reports requests per second, latency
+percentiles and failed requests.
+
+The database is a fresh SQLite file per run, or --database-url (e.g. a
+scratch PostgreSQL database; the benchmark adds items to it on every run
+and does not remove them). Async routes pay off when requests wait on
+the database, as they do over a network; SQLite answers from the local
+file, and aiosqlite's thread hand-offs cost more than they save.
+
+The clients run in this process, so on a small machine they compete with
+the server for CPU; compare the two variants rather than the absolute
+numbers. Run from the backend directory:
+
+    python -m benchmarks.async_inventory --clients 100 250 500 1000
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+INITIAL_STOCK = 1_000_000_000
+# Uvicorn app for each variant, as import strings.
+APPS = {
+    "sync": "benchmarks.async_inventory:sync_app",
+    "async": "main:app",
+}
+
+
+def sync_app():
+    """The inventory routes used here as sync handlers, as main.py had them before they became async."""
+    from fastapi import Depends, FastAPI
+    from sqlalchemy.orm import Session
+
+    from models.database import get_db, init_db
+    from models.schemas import InventoryItemResponse, StockTransactionCreate, StockTransactionResponse
+    from services.inventory import InventoryService
+
+    init_db()
+    app = FastAPI()
+
+    @app.get("/inventory/{item_id}", response_model=InventoryItemResponse)
+    def get_inventory_item(item_id: int, db: Session = Depends(get_db)):
+        return InventoryService(db).get_item(item_id)
+
+    @app.post("/stock/transaction/", response_model=StockTransactionResponse)
+    def create_stock_transaction(transaction: StockTransactionCreate, db: Session = Depends(get_db)):
+        return InventoryService(db).create_transaction(transaction)
+
+    return app
+
+
+def _seed(url, n_items):
+    """Add n_items items to the database at url and return their ids."""
+    from models.database import Base, DatabaseConfig, InventoryItem, create_db_engine
+
+    engine = create_db_engine(DatabaseConfig(url))
+    Base.metadata.create_all(bind=engine)
+    prefix = f"bench-{time.time_ns()}"
+    with engine.begin() as connection:
+        item_ids = connection.scalars(
+            InventoryItem.__table__.insert().returning(InventoryItem.id),
+            [
+                {"walmart_item_id": f"{prefix}-{i}", "name": f"Item {i}", "category": "Benchmark",
+                 "price": 1.0, "current_stock": INITIAL_STOCK}
+                for i in range(n_items)
+            ],
+        ).all()
+    engine.dispose()
+    return item_ids
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(app, url, port):
+    env = {**os.environ, "DATABASE_URL": url, "FORECAST_WARMUP": "lazy"}
+    command = [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    if app == APPS["sync"]:
+        command.append("--factory")
+    return subprocess.Popen(command, env=env)
+
+
+async def _wait_until_up(client, base, item_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{base}/inventory/{item_id}")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base} did not come up")
+
+
+async def _load(base, clients, duration, item_ids, write_ratio, seed=0):
+    import httpx
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    latencies, errors = [], Counter()
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await _wait_until_up(client, base, item_ids[0])
+        deadline = time.perf_counter() + duration
+
+        async def user(k):
+            rng = random.Random(seed * 100_000 + k)
+            while time.perf_counter() < deadline:
+                item_id = rng.choice(item_ids)
+                started = time.perf_counter()
+                try:
+                    if rng.random() < write_ratio:
+                        response = await client.post(f"{base}/stock/transaction/", json={
+                            "item_id": item_id, "transaction_type": rng.choice(["IN", "OUT"]), "quantity": 1,
+                        })
+                    else:
+                        response = await client.get(f"{base}/inventory/{item_id}")
+                    if response.status_code >= 400:
+                        errors[f"HTTP {response.status_code}"] += 1
+                except Exception as exc:
+                    errors[type(exc).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(k) for k in range(clients)))
+        elapsed = time.perf_counter() - started
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "errors": errors,
+    }
+
+
+def run(client_levels, duration, n_items, write_ratio, database_url=None):
+    print(f"{n_items} items, {write_ratio:.0%} writes, {duration}s per run on {database_url or 'SQLite'}")
+    print(f"{'routes':<8}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for variant, app in APPS.items():
+        for clients in client_levels:
+            with tempfile.TemporaryDirectory() as directory:
+                url = database_url or f"sqlite:///{directory}/inventory.db"
+                item_ids = _seed(url, n_items)
+                port = _free_port()
+                server = _serve(app, url, port)
+                try:
+                    result = asyncio.run(_load(f"http://127.0.0.1:{port}", clients, duration, item_ids, write_ratio))
+                finally:
+                    server.terminate()
+                    server.wait()
+            n_errors = sum(result["errors"].values())
+            print(
+                f"{variant:<8}{clients:>8}{result['rps']:>10.0f}{result['p50_ms']:>10.1f}"
+                f"{result['p99_ms']:>10.1f}{n_errors:>8}"
+            )
+            for error, count in result["errors"].most_common(3):
+                print(f"{'':<16}{count:>6} x {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 250, 500, 1000],
+                        help="Concurrent client levels to run")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per run")
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Share of requests that are stock transactions")
+    parser.add_argument("--database-url", help="Serve this database instead of a fresh SQLite file per run")
+    args = parser.parse_args()
+    run(args.clients, args.duration, args.items, args.write_ratio, args.database_url)
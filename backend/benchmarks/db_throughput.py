@@ -0,0 +1,183 @@
+"""
+Stock-transaction throughput of the inventory database under concurrent writers.
+
+Each configuration gets a fresh database with --items items. --threads
+writer threads (like FastAPI's worker threads) then each post --requests
+requests through InventoryService: single transactions, or bulk batches of
+--batch-size. It reports transactions per second, request latency
+percentiles, errors (e.g. "database is locked") and whether every item's
+stock still matches its transaction ledger. Configurations:
+
+- sqlite-default: SQLite with its default rollback journal and pool
+- sqlite-wal: the DatabaseConfig defaults (WAL, synchronous=NORMAL,
+  busy_timeout, mmap_size)
+- postgres: the database at --postgres-url, if given; the benchmark's
+  tables are created if missing and its rows deleted afterwards
+
+Run from the backend directory:
+
+    python -m benchmarks.db_throughput --threads 16 --requests 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base, DatabaseConfig, InventoryItem, StockTransaction, create_db_engine
+from models.schemas import BulkMode, StockTransactionCreate
+from services.inventory import InventoryService
+
+INITIAL_STOCK = 1_000_000
+
+
+def configurations(directory, postgres_url=None):
+    sqlite_default = DatabaseConfig(
+        f"sqlite:///{directory}/default.db", pool_size=5, max_overflow=10,
+        sqlite_journal_mode=None, sqlite_synchronous=None, sqlite_busy_timeout_ms=None, sqlite_mmap_size=None,
+    )
+    configs = {
+        "sqlite-default": sqlite_default,
+        "sqlite-wal": DatabaseConfig(f"sqlite:///{directory}/wal.db"),
+    }
+    if postgres_url:
+        configs["postgres"] = DatabaseConfig(postgres_url)
+    return configs
+
+
+def _seed(Session, n_items, prefix):
+    with Session() as db:
+        items = [
+            InventoryItem(
+                walmart_item_id=f"{prefix}-{i}", name=f"Item {i}", category="Benchmark",
+                current_stock=INITIAL_STOCK,
+            )
+            for i in range(n_items)
+        ]
+        db.add_all(items)
+        db.commit()
+        return [item.id for item in items]
+
+
+def _check_ledger(Session, item_ids):
+    """Whether each item's stock equals its initial stock plus its ledger's movements."""
+    with Session() as db:
+        for item_id in item_ids:
+            stock = db.get(InventoryItem, item_id).current_stock
+            last = db.scalar(
+                select(StockTransaction.new_stock)
+                .where(StockTransaction.item_id == item_id)
+                .order_by(StockTransaction.id.desc())
+                .limit(1)
+            )
+            if last is not None and last != stock:
+                return False
+    return True
+
+
+def _cleanup(Session, item_ids):
+    with Session() as db:
+        db.execute(delete(StockTransaction).where(StockTransaction.item_id.in_(item_ids)))
+        db.execute(delete(InventoryItem).where(InventoryItem.id.in_(item_ids)))
+        db.commit()
+
+
+def run_config(config, threads, requests, batch_size, n_items, seed=0):
+    engine = create_db_engine(config)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    item_ids = _seed(Session, n_items, f"bench-{os.getpid()}-{time.time_ns()}")
+    latencies, errors = [], Counter()
+    applied = [0]
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def writer(k):
+        rng = random.Random(seed * 1000 + k)
+        local_latencies, local_errors, local_applied = [], Counter(), 0
+        start_barrier.wait()
+        for _ in range(requests):
+            movements = [
+                StockTransactionCreate(
+                    item_id=rng.choice(item_ids),
+                    transaction_type="OUT" if rng.random() < 0.7 else "IN",
+                    quantity=rng.randint(1, 5),
+                )
+                for _ in range(batch_size)
+            ]
+            started = time.perf_counter()
+            db = Session()
+            try:
+                service = InventoryService(db)
+                if batch_size == 1:
+                    service.create_transaction(movements[0])
+                    local_applied += 1
+                else:
+                    local_applied += service.create_transactions_bulk(movements, BulkMode.BEST_EFFORT).succeeded
+            except HTTPException as exc:
+                local_errors[f"HTTP {exc.status_code}"] += 1
+            except Exception as exc:
+                local_errors[f"{type(exc).__name__}: {str(exc).splitlines()[0][:60]}"] += 1
+                db.rollback()
+            finally:
+                db.close()
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            errors.update(local_errors)
+            applied[0] += local_applied
+
+    workers = [threading.Thread(target=writer, args=(k,)) for k in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    consistent = _check_ledger(Session, item_ids)
+    if not config.is_sqlite:
+        _cleanup(Session, item_ids)
+    engine.dispose()
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "tx_per_s": applied[0] / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "errors": errors,
+        "consistent": consistent,
+    }
+
+
+def run(threads, requests, batch_size, n_items, postgres_url=None):
+    print(f"{threads} threads x {requests} requests of {batch_size} transaction(s) on {n_items} items")
+    print(f"{'config':<16}{'tx/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}  consistent")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, config in configurations(directory, postgres_url).items():
+            result = run_config(config, threads, requests, batch_size, n_items)
+            n_errors = sum(result["errors"].values())
+            print(
+                f"{name:<16}{result['tx_per_s']:>10.0f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{n_errors:>8}  {'yes' if result['consistent'] else 'NO'}"
+            )
+            for error, count in result["errors"].most_common(3):
+                print(f"{'':<16}{count:>6} x {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per thread")
+    parser.add_argument("--batch-size", type=int, default=1, help="Transactions per request; >1 uses the bulk path")
+    parser.add_argument("--items", type=int, default=10, help="Items written to; fewer means more contention")
+    parser.add_argument("--postgres-url", default=os.environ.get("BENCHMARK_POSTGRES_URL"),
+                        help="Also benchmark this PostgreSQL database (BENCHMARK_POSTGRES_URL)")
+    args = parser.parse_args()
+    run(args.threads, args.requests, args.batch_size, args.items, args.postgres_url)
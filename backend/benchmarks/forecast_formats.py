@@ -0,0 +1,82 @@
+"""
+Payload size and encode/decode time of the /forecast/date-range response formats.
+
+Run from the backend directory:
+
+    python -m benchmarks.forecast_formats --days 365
+"""
+import argparse
+import io
+import json
+import time
+from typing import List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import TypeAdapter
+
+from models.schemas import ForecastFormat, ForecastOutputDateRange
+from services.forecasting import ForecastingService
+from services.forecast_formats import stream_frames
+
+
+def _json_encode(chunks):
+    # What the default endpoint does: to_dict, pydantic validation of every
+    # row against the response model, then JSON serialization.
+    df = pd.concat(chunks, ignore_index=True)
+    adapter = TypeAdapter(List[ForecastOutputDateRange])
+    return adapter.dump_json(adapter.validate_python(df.to_dict(orient="records")))
+
+
+def _json_decode(payload):
+    return pd.DataFrame(json.loads(payload))
+
+
+def _streamed_encode(fmt):
+    def encode(chunks):
+        parts = [p.encode() if isinstance(p, str) else p for p in stream_frames(chunks, fmt)]
+        return b"".join(parts)
+    return encode
+
+
+DECODERS = {
+    ForecastFormat.NDJSON: lambda payload: pd.read_json(io.BytesIO(payload), lines=True),
+    ForecastFormat.CSV: lambda payload: pd.read_csv(io.BytesIO(payload), parse_dates=["date"]),
+    ForecastFormat.ARROW: lambda payload: pa.ipc.open_stream(payload).read_all().to_pandas(),
+    ForecastFormat.PARQUET: lambda payload: pq.read_table(io.BytesIO(payload)).to_pandas(),
+}
+
+
+def _best_of(func, arg, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(days, repeat):
+    service = ForecastingService()
+    end = pd.Timestamp("2025-01-01") + pd.Timedelta(days=days - 1)
+    chunks = list(service.iter_date_range("2025-01-01", str(end.date())))
+    n_rows = sum(len(chunk) for chunk in chunks)
+
+    codecs = [("json (pydantic)", _json_encode, _json_decode)]
+    codecs += [(fmt.value, _streamed_encode(fmt), DECODERS[fmt]) for fmt in DECODERS]
+
+    print(f"{n_rows} rows ({days} days)")
+    print(f"{'format':<16}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    for name, encode, decode in codecs:
+        encode_s, payload = _best_of(encode, chunks, repeat)
+        decode_s, _ = _best_of(decode, payload, repeat)
+        print(f"{name:<16}{len(payload):>12}{encode_s * 1000:>12.1f}{decode_s * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.days, args.repeat)
@@ -0,0 +1,55 @@
+"""
+Cold-start cost of importing the API, with and without the forecasting stack.
+
+Each case runs in a fresh interpreter, so nothing is already imported.
+Run from the backend directory:
+
+    python -m benchmarks.import_time --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["pandas", "numpy", "sklearn", "xgboost", "pyarrow", "ml.forecasting"]
+
+CASES = {
+    "import main": "import main",
+    "import main + forecasting": "import main, services.forecasting",
+    "import main + model load": "import main, services.forecasting as f; f.ForecastingService.get_model()",
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _measure(statement):
+    code = PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=backend_dir, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(repeat):
+    print(f"{'case':<28}{'median ms':>12}{'min ms':>10}  heavy modules loaded")
+    for name, statement in CASES.items():
+        results = [_measure(statement) for _ in range(repeat)]
+        timings = [r["ms"] for r in results]
+        loaded = ", ".join(results[-1]["loaded"]) or "-"
+        print(f"{name:<28}{statistics.median(timings):>12.1f}{min(timings):>10.1f}  {loaded}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.repeat)
@@ -0,0 +1,61 @@
+"""
+Load time and single-row / bulk predict latency of each model backend.
+
+Run from the backend directory:
+
+    python -m benchmarks.model_backends --rows 18250
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ml.catalogue import load_catalogue
+from ml.forecasting import FeatureEncoder
+from ml.loader import load_predictor
+
+BACKENDS = ["sklearn", "booster", "numpy"]
+
+
+def _median_ms(func, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def run(n_rows, repeat, threads):
+    print(f"{'backend':<10}{'load ms':>10}{'1 row ms':>12}{f'{n_rows} rows ms':>16}{'max |diff|':>12}")
+    _, X_columns, _ = load_predictor("numpy")
+    encoder = FeatureEncoder(X_columns, load_catalogue())
+    days = -(-n_rows // (len(encoder.stores) * len(encoder.items)))
+    X, _ = encoder.encode_grid(pd.date_range("2025-01-01", periods=days), encoder.stores, encoder.items)
+    X = X[:n_rows]
+
+    reference = None
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        predictor, _, _ = load_predictor(backend)
+        load_ms = (time.perf_counter() - start) * 1000
+        predictor.set_threads(threads)
+
+        single_ms = _median_ms(predictor.predict, X[:1], repeat * 20)
+        bulk_ms = _median_ms(predictor.predict, X, repeat)
+        predictions = predictor.predict(X)
+        if reference is None:
+            reference = predictions
+        diff = float(np.abs(predictions - reference).max())
+        print(f"{backend:<10}{load_ms:>10.1f}{single_ms:>12.3f}{bulk_ms:>16.1f}{diff:>12.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=18250)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+    np.random.seed(0)
+    run(args.rows, args.repeat, args.threads)
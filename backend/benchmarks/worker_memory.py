@@ -0,0 +1,87 @@
+"""
+Per-worker memory of each model backend with several worker processes alive.
+
+Starts --workers fresh processes per backend, like Uvicorn/Gunicorn workers.
+Each loads the model, the forecast cube for --cube-days and scores them, then
+reports its RSS and PSS (proportional set size: shared pages are split
+between the processes mapping them, so it shows what sharing saves).
+Linux only. Run from the backend directory:
+
+    python -m benchmarks.worker_memory --workers 4 --cube-days 365
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+BACKENDS = ["sklearn", "booster", "numpy", "mmap"]
+
+
+def _memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields["Rss"], fields["Pss"]
+
+
+def _worker(backend, cube_days, cube_dir, results, release):
+    import pandas as pd
+
+    from ml.catalogue import load_catalogue
+    from ml.feature_providers import SyntheticFeatureProvider
+    from ml.forecast_cube import ForecastCube
+    from ml.forecasting import FeatureEncoder
+    from ml.loader import load_predictor
+
+    predictor, X_columns, _ = load_predictor(backend)
+    predictor.set_threads(1)
+    encoder = FeatureEncoder(X_columns, load_catalogue())
+    provider = SyntheticFeatureProvider()
+    X, _ = encoder.encode_grid(pd.date_range("2025-01-01", periods=7), encoder.stores, encoder.items, provider)
+    predictor.predict(X)
+    if cube_days:
+        cube = ForecastCube.materialize(
+            predictor, encoder, provider, version=("benchmark", provider.cache_key),
+            start="2025-01-01", days=cube_days, stores=encoder.stores, items=encoder.items, directory=cube_dir,
+        )
+        # Touch every page, as serving the whole horizon would.
+        float(cube.data.sum())
+    results.put(_memory_kb())
+    release.wait()
+
+
+def run(workers, cube_days):
+    context = multiprocessing.get_context("spawn")
+    print(f"{workers} workers, {cube_days}-day cube")
+    print(f"{'backend':<10}{'RSS MiB/worker':>16}{'PSS MiB/worker':>16}{'PSS MiB total':>15}")
+    with tempfile.TemporaryDirectory() as cube_dir:
+        for backend in BACKENDS:
+            results, release = context.Queue(), context.Event()
+            processes = [
+                context.Process(target=_worker, args=(backend, cube_days, cube_dir, results, release))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            # Measure only once all workers are up, so shared pages are
+            # split between all of them.
+            samples = [results.get() for _ in processes]
+            release.set()
+            for process in processes:
+                process.join()
+            rss = sum(sample[0] for sample in samples) / workers / 1024
+            pss = sum(sample[1] for sample in samples) / 1024
+            print(f"{backend:<10}{rss:>16.1f}{pss / workers:>16.1f}{pss:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--cube-days", type=int, default=365)
+    args = parser.parse_args()
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        parser.error("needs Linux /proc/self/smaps_rollup")
+    run(args.workers, args.cube_days)
@@ -1,16 +1,23 @@
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
 from typing import List, Union
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.database import get_db, init_db
+from models.database import AsyncDatabase, engine, get_async_db, init_db
 from models.schemas import (
     InventoryItemCreate,
     InventoryItemResponse,
     UpdateItemSchema,
     StockTransactionCreate,
     StockTransactionResponse,
+    StockTransactionBulkCreate,
+    StockTransactionBulkResponse,
     InventoryStats,
     ForecastInputSingleDay,
     ForecastOutputSingleDay,
@@ -19,14 +26,94 @@ from models.schemas import (
     ForecastInputDateRange,
     ForecastOutputDateRange,
     ForecastInputSingleDayAllStores,
+    ForecastInputBatch,
+    ForecastCacheStats,
+    ForecastFormat,
+    ForecastExecutorStats,
+    ForecastBatcherStats,
+    ForecastModelVersion,
+    ForecastCatalogue,
+    ReadinessStatus,
 )
-from services.inventory import InventoryService
-from services.forecasting import ForecastingService
+from services.inventory import AsyncInventoryService
+from services.inventory_stats import ensure_inventory_stats
+from services.inference import forecast_batcher, forecast_executor
+from services.forecast_formats import MEDIA_TYPES, negotiate_format, stream_frames, stream_json_array
+
+# services.forecasting pulls in pandas, the ml package and the model
+# backend, so it is only imported on the forecast executor: in the startup
+# warm-up task, or by the first forecast request if warm-up is disabled.
+# Pods that only serve inventory traffic never pay for it.
+FORECAST_MODULE = "services.forecasting"
+
+
+def _forecasting_service():
+    from services.forecasting import ForecastingService
+
+    return ForecastingService
+
+
+def _forecast_warm():
+    """Whether the model is loaded, checked without importing the forecasting stack."""
+    module = sys.modules.get(FORECAST_MODULE)
+    return module is not None and module.ForecastingService.is_warm()
+
+
+async def _record_sales(inventory_service, transactions):
+    """
+    Feed OUT transactions to the forecast demand features, if a loaded
+    model uses them. Recording takes the demand store's lock, so it runs on
+    the forecast executor rather than the event loop.
+    """
+    module = sys.modules.get(FORECAST_MODULE)
+    if module is None or not module.ForecastingService.tracks_demand():
+        return
+    sales = [t for t in transactions if t.transaction_type == "OUT"]
+    if not sales:
+        return
+    items = await inventory_service.get_items(t.item_id for t in sales)
+    await forecast_executor.submit(
+        module.ForecastingService.record_sales,
+        [items[t.item_id].name for t in sales],
+        [t.quantity for t in sales],
+        [t.timestamp for t in sales],
+    )
+
+
+class StartupState:
+    inventory_ready = False
+    # "background" loads the model on the executor right after startup,
+    # "lazy" leaves it to the first forecast request.
+    forecast_warmup = os.environ.get("FORECAST_WARMUP", "background")
+    forecast_error = None
+
+
+async def _warm_up_forecasting():
+    try:
+        await forecast_executor.submit(lambda: _forecasting_service().get_model())
+    except Exception as exc:
+        StartupState.forecast_error = repr(exc)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    ensure_inventory_stats(engine)
+    StartupState.inventory_ready = True
+    warmup = None
+    if StartupState.forecast_warmup == "background":
+        warmup = asyncio.create_task(_warm_up_forecasting())
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    await AsyncDatabase.dispose()
+
 
 app = FastAPI(
     title="Walmart Supply Chain API",
     description="API for managing Walmart's supply chain inventory",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -37,18 +124,33 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-# Initialize database tables
-init_db()
-
 @app.get("/", tags=["Health"])
 def read_root():
     """Health check endpoint"""
     return {"status": "healthy", "message": "Supply Chain API is running"}
 
+@app.get("/health/ready", response_model=ReadinessStatus, tags=["Health"])
+async def readiness(response: Response, require_forecast: bool = False):
+    """
+    Readiness probe.
+
+    Answers 503 until the database is initialized, or, with
+    require_forecast=true, until the forecast model is loaded too.
+    """
+    status = ReadinessStatus(
+        inventory_ready=StartupState.inventory_ready,
+        forecast_warm=_forecast_warm(),
+        forecast_warmup=StartupState.forecast_warmup,
+        forecast_error=StartupState.forecast_error,
+    )
+    if not status.inventory_ready or (require_forecast and not status.forecast_warm):
+        response.status_code = 503
+    return status
+
 @app.post("/inventory/", response_model=InventoryItemResponse, tags=["Inventory"])
-def create_inventory_item(
+async def create_inventory_item(
     item: InventoryItemCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new inventory item.
@@ -59,13 +161,13 @@ def create_inventory_item(
     Returns:
     - InventoryItemResponse: Created inventory item details
     """
-    inventory_service = InventoryService(db)
-    return inventory_service.create_item(item)
+    inventory_service = AsyncInventoryService(db)
+    return await inventory_service.create_item(item)
 
 @app.get("/inventory/{item_id}", response_model=InventoryItemResponse, tags=["Inventory"])
-def get_inventory_item(
+async def get_inventory_item(
     item_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get details of a specific inventory item.
@@ -79,15 +181,15 @@ def get_inventory_item(
     Raises:
     - HTTPException 404: If item not found
     """
-    inventory_service = InventoryService(db)
-    return inventory_service.get_item(item_id)
+    inventory_service = AsyncInventoryService(db)
+    return await inventory_service.get_item(item_id)
 
 @app.get("/inventory/", response_model=List[InventoryItemResponse], tags=["Inventory"])
-def list_inventory_items(
+async def list_inventory_items(
     low_stock: bool = False,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     List all inventory items with pagination, optionally filtering for low stock items.
@@ -100,16 +202,16 @@ def list_inventory_items(
     Returns:
     - List[InventoryItemResponse]: List of inventory items
     """
-    inventory_service = InventoryService(db)
+    inventory_service = AsyncInventoryService(db)
     if low_stock:
-        return inventory_service.get_low_stock_items(skip=skip, limit=limit)
-    return inventory_service.list_items(skip=skip, limit=limit)
+        return await inventory_service.get_low_stock_items(skip=skip, limit=limit)
+    return await inventory_service.list_items(skip=skip, limit=limit)
 
 @app.put("/inventory/{item_id}", response_model=InventoryItemResponse, tags=["Inventory"])
-def update_inventory_item(
+async def update_inventory_item(
     item_id: int,
     item: UpdateItemSchema,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update an existing inventory item.
@@ -121,13 +223,13 @@ def update_inventory_item(
     Returns:
     - InventoryItemResponse: Updated inventory item details
     """
-    inventory_service = InventoryService(db)
-    return inventory_service.update_item(item_id, item)
+    inventory_service = AsyncInventoryService(db)
+    return await inventory_service.update_item(item_id, item)
 
 @app.delete("/inventory/{item_id}", status_code=204, tags=["Inventory"])
-def delete_inventory_item(
+async def delete_inventory_item(
     item_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Delete an inventory item.
@@ -138,14 +240,14 @@ def delete_inventory_item(
     Returns:
     - HTTP 204 No Content on successful deletion
     """
-    inventory_service = InventoryService(db)
-    inventory_service.delete_item(item_id)
+    inventory_service = AsyncInventoryService(db)
+    await inventory_service.delete_item(item_id)
     return
 
 @app.post("/stock/transaction/", response_model=StockTransactionResponse, tags=["Stock"])
-def create_stock_transaction(
+async def create_stock_transaction(
     transaction: StockTransactionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new stock transaction (IN/OUT/ADJUSTMENT).
@@ -160,88 +262,249 @@ def create_stock_transaction(
     - HTTPException 404: If referenced item not found
     - HTTPException 400: If transaction would result in negative stock
     """
-    inventory_service = InventoryService(db)
-    return inventory_service.create_transaction(transaction)
+    inventory_service = AsyncInventoryService(db)
+    created = await inventory_service.create_transaction(transaction)
+    await _record_sales(inventory_service, [created])
+    return created
+
+@app.post("/stock/transactions/bulk", response_model=StockTransactionBulkResponse, tags=["Stock"])
+async def create_stock_transactions_bulk(
+    batch: StockTransactionBulkCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create many stock transactions with one commit.
+
+    Parameters:
+    - batch: The transactions, applied in list order, and the mode:
+      "atomic" (default) applies all of them or none, "best_effort"
+      applies those that can be and reports the others
+
+    Returns:
+    - StockTransactionBulkResponse: Success or error of each transaction
+
+    Raises:
+    - HTTP 400 (with the per-transaction report) if an atomic batch was rejected
+    """
+    inventory_service = AsyncInventoryService(db)
+    result = await inventory_service.create_transactions_bulk(batch.transactions, batch.mode)
+    if not result.committed:
+        response.status_code = 400
+    else:
+        await _record_sales(inventory_service, [r.transaction for r in result.results if r.success])
+    return result
 
 @app.get("/inventory/stats/", response_model=InventoryStats, tags=["Inventory"])
-def get_inventory_stats(
-    db: Session = Depends(get_db)
+async def get_inventory_stats(
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get inventory statistics.
-    
+
+    Read from totals that every inventory write keeps up to date, so the
+    cost does not grow with the number of items.
+
     Returns:
     - InventoryStats: Statistics about the inventory
     """
-    inventory_service = InventoryService(db)
-    return inventory_service.get_inventory_stats()
+    inventory_service = AsyncInventoryService(db)
+    return await inventory_service.get_inventory_stats()
 
 # Forecasting Endpoints
+#
+# Forecast handlers are async and hand scoring to forecast_executor, a
+# bounded pool, so CPU-bound scoring never blocks the event loop the
+# inventory routes run on.
+# When its queue is full they answer 503 instead of piling up work.
+#
+# Each takes an optional model_version to score with a specific registered
+# model (e.g. for A/B comparisons) instead of the active one.
 @app.post("/forecast/single-day", response_model=ForecastOutputSingleDay, tags=["Forecasting"])
-def forecast_single_day(
+async def forecast_single_day(
     forecast_input: ForecastInputSingleDay,
+    model_version: str | None = None,
 ):
     """
     Forecasts sales for a single item, in a single store on a specific day.
+
+    Concurrent requests are coalesced by forecast_batcher into one model call.
     """
-    forecasting_service = ForecastingService()
-    return forecasting_service.forecast_item_store_single_day(
-        item=forecast_input.item,
-        store=forecast_input.store,
-        date_str=forecast_input.date,
+    if forecast_batcher.enabled:
+        return await forecast_batcher.forecast(
+            forecast_input.item, forecast_input.store, forecast_input.date, model_version
+        )
+    return await forecast_executor.run(
+        lambda: _forecasting_service()(model_version).forecast_item_store_single_day(
+            item=forecast_input.item,
+            store=forecast_input.store,
+            date_str=forecast_input.date,
+        )
     )
 
 @app.post("/forecast/monthly", response_model=List[ForecastOutputMonthly], tags=["Forecasting"])
-def forecast_monthly(
+async def forecast_monthly(
     forecast_input: ForecastInputMonthly,
+    format: ForecastFormat | None = None,
+    model_version: str | None = None,
+    accept: str | None = Header(default=None),
 ):
     """
     Forecasts monthly sales for all items in a specific store.
+
+    Set format (or the Accept header) to arrow or parquet for a columnar
+    response, or ndjson/csv.
     """
-    forecasting_service = ForecastingService()
-    result_df = forecasting_service.forecast_monthly_demand_for_store(
-        store=forecast_input.store,
-        year=forecast_input.year,
-        month=forecast_input.month,
+    result_df = await forecast_executor.run(
+        lambda: _forecasting_service()(model_version).forecast_monthly_demand_for_store(
+            store=forecast_input.store,
+            year=forecast_input.year,
+            month=forecast_input.month,
+        )
     )
+    fmt = negotiate_format(format, accept)
+    if fmt != ForecastFormat.JSON:
+        return StreamingResponse(stream_frames([result_df], fmt), media_type=MEDIA_TYPES[fmt])
     return result_df.to_dict(orient="records")
 
 
 @app.post("/forecast/date-range", response_model=List[ForecastOutputDateRange], tags=["Forecasting"])
-def forecast_date_range(
+async def forecast_date_range(
     forecast_input: ForecastInputDateRange,
+    format: ForecastFormat | None = None,
+    model_version: str | None = None,
+    accept: str | None = Header(default=None),
 ):
     """
     Forecasts sales for all items and stores over a given date range.
+
+    Set format (or the Accept header) to ndjson, csv, arrow or parquet to
+    stream the result a week of dates at a time instead of returning one
+    JSON array. Arrow and Parquet are encoded column by column.
     """
-    forecasting_service = ForecastingService()
-    result_df = forecasting_service.forecast_date_range(
-        start_date=forecast_input.start_date,
-        end_date=forecast_input.end_date,
+    fmt = negotiate_format(format, accept)
+    if fmt != ForecastFormat.JSON:
+        forecasting_service = await forecast_executor.run(lambda: _forecasting_service()(model_version))
+        chunks = stream_frames(
+            forecasting_service.iter_date_range(
+                start_date=forecast_input.start_date,
+                end_date=forecast_input.end_date,
+            ),
+            fmt,
+            empty=forecasting_service.empty_date_range(),
+        )
+        # Each chunk is scored and encoded on the executor as it is sent.
+        return StreamingResponse(forecast_executor.iterate(chunks), media_type=MEDIA_TYPES[fmt])
+
+    return await forecast_executor.run(
+        lambda: _forecasting_service()(model_version).forecast_date_range(
+            start_date=forecast_input.start_date,
+            end_date=forecast_input.end_date,
+        ).to_dict(orient="records")
     )
-    return result_df.to_dict(orient="records")
 
 
 @app.post("/forecast/single-day-all-stores", response_model=List[ForecastOutputSingleDay], tags=["Forecasting"])
-def forecast_single_day_all_stores(
+async def forecast_single_day_all_stores(
     forecast_input: ForecastInputSingleDayAllStores,
+    model_version: str | None = None,
 ):
     """
     Forecasts sales for a single item across all stores on a specific day.
     """
-    forecasting_service = ForecastingService()
-    return forecasting_service.forecast_item_single_day_all_stores(
-        item=forecast_input.item,
-        date_str=forecast_input.date,
+    return await forecast_executor.run(
+        lambda: _forecasting_service()(model_version).forecast_item_single_day_all_stores(
+            item=forecast_input.item,
+            date_str=forecast_input.date,
+        )
     )
 
 
+@app.post("/forecast/batch", response_model=List[ForecastOutputSingleDay], tags=["Forecasting"])
+async def forecast_batch(
+    forecast_input: ForecastInputBatch,
+    model_version: str | None = None,
+):
+    """
+    Forecasts sales for many (item, store, date) tuples in one model call.
+
+    Accepts explicit rows, an item x store x date grid, or both, up to
+    MAX_FORECAST_BATCH_CELLS forecasts in all; results follow the rows
+    first, then the grid in item, store, date order. The grid is expanded
+    on the executor with the scoring.
+    """
+    results = await forecast_executor.run(
+        lambda: _forecasting_service()(model_version).forecast_batch(*forecast_input.expand())
+    )
+    return StreamingResponse(stream_json_array(results), media_type=MEDIA_TYPES[ForecastFormat.JSON])
+
+
 @app.post("/forecast/reload-model", tags=["Forecasting"])
-def reload_model():
+async def reload_model(version: str | None = None):
+    """
+    Loads a model version (default: the registry's default version),
+    validates it with a smoke prediction and makes it the active model.
+
+    Requests keep being served by the previous model while it loads.
     """
-    Reloads the forecasting model from disk.
+    loaded = await forecast_executor.run(lambda: _forecasting_service().reload_model(version))
+    return {"message": f"Forecasting model {loaded} is now active", "version": loaded}
+
+
+@app.get("/forecast/models", response_model=List[ForecastModelVersion], tags=["Forecasting"])
+async def forecast_models():
+    """
+    Lists registered model versions and which are loaded and active.
+    """
+    return await forecast_executor.run(lambda: _forecasting_service().model_versions())
+
+
+@app.get("/forecast/catalogue", response_model=ForecastCatalogue, tags=["Forecasting"])
+async def forecast_catalogue(model_version: str | None = None):
+    """
+    Lists the stores and items that can be forecast: those in the catalogue
+    that the model was trained on.
+    """
+    encoder = await forecast_executor.run(lambda: _forecasting_service()(model_version).encoder)
+    return {"stores": encoder.stores, "items": encoder.items}
+
+
+@app.post("/forecast/reload-catalogue", response_model=ForecastCatalogue, tags=["Forecasting"])
+async def reload_catalogue():
+    """
+    Reads the store and item catalogue from its source again, so new stores
+    and items are served without a restart once the model knows them.
+    """
+    await forecast_executor.run(lambda: _forecasting_service().reload_catalogue())
+    return await forecast_catalogue()
+
+
+@app.get("/forecast/executor-stats", response_model=ForecastExecutorStats, tags=["Forecasting"])
+async def forecast_executor_stats():
+    """
+    Returns the size, current load and rejection count of the forecast executor.
+    """
+    return forecast_executor.stats()
+
+
+@app.get("/forecast/batcher-stats", response_model=ForecastBatcherStats, tags=["Forecasting"])
+async def forecast_batcher_stats():
+    """
+    Returns single-day micro-batching settings, batch-size and latency
+    histograms, and p50/p99 latency over recent requests.
+    """
+    return forecast_batcher.stats()
+
+
+@app.get("/forecast/cache-stats", response_model=ForecastCacheStats, tags=["Forecasting"])
+async def forecast_cache_stats():
+    """
+    Returns hit/miss counters and occupancy of the forecast prediction cache.
+
+    Until the forecasting stack is loaded there is no cache yet: the
+    counters are zero and maxsize is null.
     """
-    ForecastingService._model = None
-    ForecastingService._X_columns = None
-    ForecastingService.get_model()
-    return {"message": "Forecasting model reloaded successfully"}
\ No newline at end of file
+    module = sys.modules.get(FORECAST_MODULE)
+    if module is None:
+        return ForecastCacheStats(hits=0, misses=0, hit_rate=0.0, size=0)
+    return module.ForecastingService.cache_stats()
\ No newline at end of file
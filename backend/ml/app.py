@@ -6,7 +6,9 @@ import joblib
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from catalogue import load_catalogue
 from forecasting import (
+    FeatureEncoder,
     forecast_future,
     forecast_item_store_single_day,
     forecast_monthly_demand_for_store
@@ -14,7 +16,7 @@ from forecasting import (
 
 # Load model and columns
 model = joblib.load("xgb_model.pkl")
-X_columns = joblib.load("xgb_model_columns.pkl")
+encoder = FeatureEncoder(joblib.load("xgb_model_columns.pkl"), load_catalogue())
 
 st.set_page_config(page_title="Demand Forecasting App", layout="wide")
 st.title("🛒 Store & Item Demand Forecasting")
@@ -36,7 +38,7 @@ with tabs[0]:
         st.warning("Start date must be before end date.")
     else:
         if st.button("🔮 Forecast Full Range"):
-            future_df = forecast_future(model, X_columns, start_date, end_date)
+            future_df = forecast_future(model, encoder, start_date, end_date)
             st.dataframe(future_df.head(20))
 
             st.success("Forecast complete! Showing top results.")
@@ -50,37 +52,36 @@ with tabs[0]:
 # 🛍️ Tab 2: Forecast for a single item across all stores
 with tabs[1]:
     st.subheader("Forecast One Item Across All Stores on a Given Date")
-    item = st.selectbox("Select Item", ['Rice', 'Wheat', 'Sugar', 'Salt', 'Oil', 'Milk', 'Potato', 'Onion', 'Dal', 'Atta'], key="item_select")
+    item = st.selectbox("Select Item", encoder.items, key="item_select")
     date_str = st.date_input("Select Date", pd.to_datetime("2025-02-14"))
 
     if st.button("🔍 Forecast All Stores for Selected Item"):
-        stores = ['Kolkata', 'Asansol', 'Durgapur', 'Siliguri', 'Howrah']
         results = []
-        for store in stores:
-            res = forecast_item_store_single_day(model, X_columns, item=item, store=store, date_str=str(date_str))
+        for store in encoder.stores:
+            res = forecast_item_store_single_day(model, encoder, item=item, store=store, date_str=str(date_str))
             results.append(res)
         st.dataframe(pd.DataFrame(results))
 
 # 🏪 Tab 3: Forecast a single item + store + date
 with tabs[2]:
     st.subheader("Forecast for One Store, One Item, One Day")
-    store = st.selectbox("Select Store", ['Kolkata', 'Asansol', 'Durgapur', 'Siliguri', 'Howrah'])
-    item = st.selectbox("Select Item", ['Rice', 'Wheat', 'Sugar', 'Salt', 'Oil', 'Milk', 'Potato', 'Onion', 'Dal', 'Atta'])
+    store = st.selectbox("Select Store", encoder.stores)
+    item = st.selectbox("Select Item", encoder.items)
     date = st.date_input("Select Date for Store+Item", pd.to_datetime("2025-02-14"))
 
     if st.button("🎯 Forecast Specific Store+Item"):
-        result = forecast_item_store_single_day(model, X_columns, item=item, store=store, date_str=str(date))
+        result = forecast_item_store_single_day(model, encoder, item=item, store=store, date_str=str(date))
         st.json(result)
 
 # 📦 Tab 4: Forecast monthly demand for all items in a store
 with tabs[3]:
     st.subheader("Monthly Demand Forecast Summary for Store")
-    store = st.selectbox("Store", ['Kolkata', 'Asansol', 'Durgapur', 'Siliguri', 'Howrah'], key="summary_store")
+    store = st.selectbox("Store", encoder.stores, key="summary_store")
     year = st.number_input("Year", min_value=2024, max_value=2030, value=2025)
     month = st.number_input("Month (1-12)", min_value=1, max_value=12, value=2)
 
     if st.button("📦 Forecast Monthly Demand"):
-        monthly = forecast_monthly_demand_for_store(model, X_columns, store=store, year=year, month=month)
+        monthly = forecast_monthly_demand_for_store(model, encoder, store=store, year=year, month=month)
         st.dataframe(monthly)
 
         # Optional chart
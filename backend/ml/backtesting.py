@@ -0,0 +1,283 @@
+# backtesting.py
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import ParameterSampler
+
+from model_training import CHUNK_ROWS, PARAMS, feature_columns, iter_history, scan_history
+from feature_store import DemandFeatureStore
+from forecasting import FeatureEncoder
+
+CACHE_DIR = ".backtest_cache"
+# Values tried around the defaults in PARAMS.
+SEARCH_SPACE = {
+    "n_estimators": [100, 200, 400],
+    "learning_rate": [0.03, 0.05, 0.1, 0.2],
+    "max_depth": [3, 4, 6, 8],
+    "subsample": [0.6, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "min_child_weight": [1, 5, 10],
+}
+# Single-row predictions timed per trial for the latency column.
+LATENCY_CALLS = 50
+
+
+def rolling_origin_folds(first_date, last_date, n_folds=3, horizon_days=14, step_days=None,
+                         max_train_days=None):
+    """
+    Forecast origins for rolling-origin cross-validation.
+
+    Fold k trains on the days before its origin (the last max_train_days of
+    them, or all) and is scored on the horizon_days from the origin on.
+    Origins are step_days apart (default horizon_days) and the last fold
+    ends with the history.
+
+    Returns:
+        List of (train_start, origin, test_end) Timestamps, oldest first;
+        test_end is exclusive.
+    """
+    first_date, last_date = pd.Timestamp(first_date).normalize(), pd.Timestamp(last_date).normalize()
+    step = pd.Timedelta(days=step_days or horizon_days)
+    horizon = pd.Timedelta(days=horizon_days)
+    end = last_date + pd.Timedelta(days=1)
+    folds = []
+    for k in reversed(range(n_folds)):
+        origin = end - horizon - k * step
+        if origin <= first_date:
+            raise ValueError(
+                f"History {first_date.date()}..{last_date.date()} is too short for {n_folds} folds "
+                f"of {horizon_days} days"
+            )
+        train_start = first_date if max_train_days is None else max(
+            first_date, origin - pd.Timedelta(days=max_train_days)
+        )
+        folds.append((train_start, origin, origin + horizon))
+    return folds
+
+
+def _days(dates):
+    return pd.DatetimeIndex(dates).normalize().to_numpy(dtype="datetime64[D]").astype(np.int32)
+
+
+class FoldCache:
+    """
+    The history encoded once, as .npy arrays sorted by date.
+
+    Every fold of every trial is then a pair of contiguous row ranges of
+    the same arrays: nothing is re-encoded per trial, and the pool workers
+    memory-map the files, so they share one copy through the page cache.
+    The cache directory is keyed on the history file and column layout, so
+    a changed file is encoded again.
+    """
+
+    FILES = ("X.npy", "y.npy", "day.npy")
+
+    def __init__(self, directory, X_columns):
+        self.directory = directory
+        self.X_columns = X_columns
+        self._arrays = None
+
+    @classmethod
+    def build(cls, data_path, cache_root=CACHE_DIR, chunk_rows=CHUNK_ROWS, demand_features=False):
+        catalogue, first_date, last_date = scan_history(data_path, chunk_rows)
+        X_columns = feature_columns(catalogue, demand_features)
+        stat = os.stat(data_path)
+        key = hashlib.sha256(
+            json.dumps([os.path.abspath(data_path), stat.st_size, stat.st_mtime_ns, X_columns]).encode()
+        ).hexdigest()[:16]
+        cache = cls(os.path.join(cache_root, key), X_columns)
+        cache.first_date, cache.last_date = first_date, last_date
+        if all(os.path.exists(os.path.join(cache.directory, name)) for name in cls.FILES):
+            return cache
+
+        encoder = FeatureEncoder(X_columns)
+        demand = DemandFeatureStore(catalogue.stores, catalogue.items) if demand_features else None
+        Xs, ys, days = [], [], []
+        for df in iter_history(data_path, chunk_rows):
+            Xs.append(encoder.encode_history(df, demand.replay(df) if demand is not None else None))
+            ys.append(df['units_sold'].to_numpy(dtype=np.float32))
+            days.append(_days(df['date']))
+        day = np.concatenate(days)
+        order = np.argsort(day, kind="stable")
+        staging = cache.directory + f".tmp{os.getpid()}"
+        os.makedirs(staging, exist_ok=True)
+        np.save(os.path.join(staging, "X.npy"), np.concatenate(Xs)[order])
+        np.save(os.path.join(staging, "y.npy"), np.concatenate(ys)[order])
+        np.save(os.path.join(staging, "day.npy"), day[order])
+        try:
+            os.rename(staging, cache.directory)
+        except OSError:
+            # Built concurrently by another run; theirs is as good.
+            for name in cls.FILES:
+                os.remove(os.path.join(staging, name))
+            os.rmdir(staging)
+        return cache
+
+    def arrays(self):
+        if self._arrays is None:
+            self._arrays = tuple(
+                np.load(os.path.join(self.directory, name), mmap_mode="r") for name in self.FILES
+            )
+        return self._arrays
+
+    def rows(self, start, end):
+        """Row range [lo, hi) of the dates in [start, end)."""
+        day = self.arrays()[2]
+        lo, hi = np.searchsorted(day, _days([start, end]))
+        return int(lo), int(hi)
+
+
+def _score_fold(model, X_test, y_test):
+    started = time.perf_counter()
+    predictions = model.predict(X_test)
+    predict_s = time.perf_counter() - started
+    errors = predictions - y_test
+    return (
+        float(np.sqrt(np.mean(np.square(errors, dtype=np.float64)))),
+        float(np.mean(np.abs(errors))),
+        predict_s / len(y_test),
+    )
+
+
+def _single_row_latency(model, X_test):
+    row = np.ascontiguousarray(X_test[:1])
+    timings = []
+    for _ in range(LATENCY_CALLS):
+        started = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def run_trial(cache, folds, params, n_jobs=1):
+    """
+    Fit and score one parameter set on every fold, with at most n_jobs
+    XGBoost threads.
+
+    Returns:
+        Dict of mean/std RMSE, mean MAE, mean fit time, batch prediction
+        time per row and median single-row latency.
+    """
+    from xgboost import XGBRegressor
+
+    X, y, _ = cache.arrays()
+    rmses, maes, fit_times, per_row = [], [], [], []
+    model = X_test = None
+    for train_start, origin, test_end in folds:
+        train_lo, train_hi = cache.rows(train_start, origin)
+        test_lo, test_hi = cache.rows(origin, test_end)
+        model = XGBRegressor(**{**PARAMS, **params}, n_jobs=n_jobs)
+        started = time.perf_counter()
+        model.fit(X[train_lo:train_hi], y[train_lo:train_hi])
+        fit_times.append(time.perf_counter() - started)
+        X_test = X[test_lo:test_hi]
+        rmse, mae, seconds_per_row = _score_fold(model, X_test, y[test_lo:test_hi])
+        rmses.append(rmse)
+        maes.append(mae)
+        per_row.append(seconds_per_row)
+    return {
+        "rmse_mean": float(np.mean(rmses)),
+        "rmse_std": float(np.std(rmses)),
+        "mae_mean": float(np.mean(maes)),
+        "fit_s": float(np.mean(fit_times)),
+        "predict_us_per_row": float(np.mean(per_row)) * 1e6,
+        "single_row_ms": _single_row_latency(model, X_test) * 1e3,
+    }
+
+
+def _run_trial_job(job):
+    trial, directory, X_columns, folds, params, n_jobs = job
+    started = time.perf_counter()
+    result = run_trial(FoldCache(directory, X_columns), folds, params, n_jobs)
+    return {"trial": trial, **result, "wall_s": time.perf_counter() - started,
+            "params": json.dumps({**PARAMS, **params}, sort_keys=True)}
+
+
+def candidate_params(n_trials, space=None, seed=42):
+    """The PARAMS defaults, then n_trials - 1 distinct random picks from space."""
+    candidates = [{}]
+    for params in ParameterSampler(space or SEARCH_SPACE, n_iter=max(0, n_trials - 1), random_state=seed):
+        params = {key: (value.item() if hasattr(value, "item") else value) for key, value in params.items()}
+        if params not in candidates:
+            candidates.append(params)
+    return candidates
+
+
+def pool_shape(n_trials, workers=None, n_jobs=None):
+    """
+    Worker processes (default one per CPU) and XGBoost threads per worker
+    (default the CPUs divided among them), so that workers * n_jobs does
+    not oversubscribe the machine.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, n_trials))
+    n_jobs = n_jobs or max(1, cpus // workers)
+    return workers, n_jobs
+
+
+def search(data_path="historical_sales.csv", n_trials=20, workers=None, n_jobs=None, n_folds=3,
+           horizon_days=14, step_days=None, max_train_days=None, space=None, seed=42,
+           cache_root=CACHE_DIR, leaderboard_path="leaderboard.csv", demand_features=False):
+    """
+    Rolling-origin backtest of n_trials parameter sets, fanned out over a
+    process pool.
+
+    Returns:
+        The leaderboard DataFrame, best RMSE first, also written to
+        leaderboard_path as CSV.
+    """
+    started = time.perf_counter()
+    cache = FoldCache.build(data_path, cache_root, demand_features=demand_features)
+    folds = rolling_origin_folds(cache.first_date, cache.last_date, n_folds, horizon_days, step_days,
+                                 max_train_days)
+    candidates = candidate_params(n_trials, space, seed)
+    workers, n_jobs = pool_shape(len(candidates), workers, n_jobs)
+    print(f"🔎 {len(candidates)} trials x {len(folds)} folds on {workers} workers x {n_jobs} threads "
+          f"(encoded history in {cache.directory})")
+
+    jobs = [(trial, cache.directory, cache.X_columns, folds, params, n_jobs)
+            for trial, params in enumerate(candidates)]
+    # Spawned rather than forked: forking after OpenMP has started is unsafe.
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(_run_trial_job, jobs))
+
+    leaderboard = pd.DataFrame(results).sort_values(["rmse_mean", "fit_s"]).reset_index(drop=True)
+    if leaderboard_path:
+        leaderboard.to_csv(leaderboard_path, index=False)
+    print(f"✅ Backtest finished in {time.perf_counter() - started:.1f}s; leaderboard in '{leaderboard_path}'")
+    return leaderboard
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backtest and tune the forecasting model.")
+    parser.add_argument("--data", default="historical_sales.csv", help="Sales history .csv or .parquet")
+    parser.add_argument("--trials", type=int, default=20, help="Parameter sets to try, the defaults included")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU, up to --trials)")
+    parser.add_argument("--n-jobs", type=int, help="XGBoost threads per worker (default: CPUs / workers)")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--horizon-days", type=int, default=14)
+    parser.add_argument("--step-days", type=int, help="Days between fold origins (default: --horizon-days)")
+    parser.add_argument("--max-train-days", type=int, help="Sliding training window (default: all history)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--out", default="leaderboard.csv")
+    parser.add_argument("--demand-features", action="store_true", help="Add lag and rolling-mean features")
+    args = parser.parse_args()
+
+    board = search(
+        args.data, args.trials, args.workers, args.n_jobs, args.folds, args.horizon_days, args.step_days,
+        args.max_train_days, seed=args.seed, cache_root=args.cache_dir, leaderboard_path=args.out,
+        demand_features=args.demand_features,
+    )
+    columns = ["trial", "rmse_mean", "rmse_std", "mae_mean", "fit_s", "predict_us_per_row", "single_row_ms"]
+    with pd.option_context("display.width", 160, "display.max_colwidth", 120):
+        print(board[columns].head(10).to_string(index=False, float_format="{:.3f}".format))
+        print(f"\nBest parameters: {board.loc[0, 'params']}")
@@ -0,0 +1,127 @@
+import json
+import os
+
+import pandas as pd
+
+# Imported both as ml.catalogue and, by the scripts in this directory, as
+# catalogue, so it only imports third-party packages.
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_CATALOGUE_PATH = os.path.join(DIR_PATH, "catalogue.json")
+
+# One-hot column prefixes, as in FeatureEncoder.
+STORE_PREFIX = 'store_id_'
+ITEM_PREFIX = 'item_id_'
+
+
+def _tables():
+    """The stores and catalogue_items tables (models.database.Store and CatalogueItem)."""
+    from sqlalchemy import column, table
+
+    return table("stores", column("id"), column("name")), table("catalogue_items", column("id"), column("name"))
+
+
+class Catalogue:
+    """
+    The stores and items that can be forecast, each with a dense integer
+    code: its position in the catalogue.
+
+    Codes are looked up through a hash index, so translating a request
+    costs O(rows requested) however large the catalogue is.
+    """
+
+    def __init__(self, stores, items):
+        self.stores = pd.Index(list(stores), dtype=object)
+        self.items = pd.Index(list(items), dtype=object)
+        for kind, index in (("store", self.stores), ("item", self.items)):
+            if not index.is_unique:
+                duplicated = index[index.duplicated()].unique().tolist()
+                raise ValueError(f"Duplicate {kind} names in catalogue: {duplicated}")
+
+    def __len__(self):
+        return len(self.stores) * len(self.items)
+
+    def __repr__(self):
+        return f"Catalogue({len(self.stores)} stores, {len(self.items)} items)"
+
+    def store_codes(self, names):
+        """Code of each store name, -1 for names not in the catalogue."""
+        return self.stores.get_indexer(pd.Index(names, dtype=object))
+
+    def item_codes(self, names):
+        """Code of each item name, -1 for names not in the catalogue."""
+        return self.items.get_indexer(pd.Index(names, dtype=object))
+
+    def to_dict(self):
+        return {"stores": self.stores.tolist(), "items": self.items.tolist()}
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_CATALOGUE_PATH):
+        """
+        Read a catalogue from JSON ({"stores": [...], "items": [...]}) or
+        from a CSV with kind (store/item) and name columns.
+        """
+        if path.endswith(".json"):
+            with open(path) as f:
+                data = json.load(f)
+            return cls(data["stores"], data["items"])
+        df = pd.read_csv(path, dtype=str)
+        kinds = df['kind'].str.strip().str.lower()
+        return cls(df.loc[kinds == 'store', 'name'], df.loc[kinds == 'item', 'name'])
+
+    @classmethod
+    def from_columns(cls, X_columns):
+        """The stores and items a model has one-hot columns for, in column order."""
+        stores = [col[len(STORE_PREFIX):] for col in X_columns if col.startswith(STORE_PREFIX)]
+        items = [col[len(ITEM_PREFIX):] for col in X_columns if col.startswith(ITEM_PREFIX)]
+        return cls(stores, items)
+
+    @classmethod
+    def from_frame(cls, df):
+        """The stores and items of a sales history, in order of first appearance."""
+        return cls(pd.unique(df['store_id'].astype(str)), pd.unique(df['item_id'].astype(str)))
+
+    @classmethod
+    def from_db(cls, connectable):
+        """
+        Read the stores and catalogue_items tables, in id order, through a
+        SQLAlchemy engine or connection.
+        """
+        from sqlalchemy import select
+
+        with connectable.connect() as connection:
+            stores, items = (
+                connection.scalars(select(t.c.name).order_by(t.c.id)).all() for t in _tables()
+            )
+        if not stores or not items:
+            raise ValueError(
+                "The stores/catalogue_items tables are empty; fill them with "
+                "Catalogue.from_file().to_db(engine)"
+            )
+        return cls(stores, items)
+
+    def to_db(self, connectable):
+        """Append the stores and items missing from the database tables, keeping catalogue order."""
+        from sqlalchemy import insert, select
+
+        with connectable.begin() as connection:
+            for t, names in zip(_tables(), (self.stores, self.items)):
+                existing = set(connection.scalars(select(t.c.name)))
+                rows = [{"name": name} for name in names if name not in existing]
+                if rows:
+                    connection.execute(insert(t), rows)
+
+
+def load_catalogue(source=None, connectable=None):
+    """
+    Load the catalogue named by source: None or "default" for catalogue.json
+    next to this file, "db" for the database tables (needs connectable), or
+    the path of a .json or .csv catalogue file.
+    """
+    if source in (None, "", "default"):
+        return Catalogue.from_file(DEFAULT_CATALOGUE_PATH)
+    if source == "db":
+        if connectable is None:
+            raise ValueError("Loading the catalogue from the database needs an engine")
+        return Catalogue.from_db(connectable)
+    return Catalogue.from_file(source)
+
@@ -1,42 +1,150 @@
 # 1_data_creation.py
+import os
+
 import pandas as pd
 import numpy as np
 
-def generate_data(start_date, end_date):
+from catalogue import load_catalogue
+from feature_store import FEATURES, DemandFeatureStore
+# Rows generated and written per block; whole days at a time.
+CHUNK_ROWS = 1_000_000
+
+
+def _names(base, count, prefix):
+    """The first count of base, padded with generated names if count is larger."""
+    if count is None:
+        return list(base)
+    width = len(str(count))
+    return list(base[:count]) + [f"{prefix}_{i:0{width}d}" for i in range(len(base) + 1, count + 1)]
+
+
+def iter_data_chunks(start_date, end_date, n_stores=None, n_items=None, seed=None,
+                     chunk_rows=CHUNK_ROWS, catalogue=None):
+    """
+    Yield the synthetic sales history a block of whole days at a time.
+
+    Each block is drawn column-wise with one call per column, in the same
+    (date, store, item) row order and schema as generate_data. The first
+    stores and items are those of catalogue (default: catalogue.json);
+    larger counts add Store_NNN / Item_NNN. With a seed the output is
+    reproducible for a given chunk_rows.
+    """
+    catalogue = catalogue or load_catalogue()
     dates = pd.date_range(start_date, end_date)
-    cities = ['Kolkata', 'Asansol', 'Durgapur', 'Siliguri', 'Howrah']
-    items = ['Rice', 'Wheat', 'Sugar', 'Salt', 'Oil', 'Milk', 'Potato', 'Onion', 'Dal', 'Atta']
-
-    data = []
-    for date in dates:
-        for city in cities:
-            for item in items:
-                base = np.random.randint(50, 200)
-                temp = np.random.normal(28, 5)
-                is_holiday = int(date.weekday() == 6)
-                variation = np.random.normal(1.0, 0.1)
-                units_sold = int(base * variation * (1.2 if is_holiday else 1.0))
-                data.append({
-                    'date': date,
-                    'store_id': city,
-                    'item_id': item,
-                    'temperature': round(temp, 2),
-                    'is_holiday': is_holiday,
-                    'units_sold': units_sold
-                })
-
-    df = pd.DataFrame(data)
-    df.to_csv("historical_sales.csv", index=False)
+    stores = _names(catalogue.stores, n_stores, "Store")
+    items = _names(catalogue.items, n_items, "Item")
+    cells_per_day = len(stores) * len(items)
+    chunk_days = max(1, chunk_rows // cells_per_day)
+    seed_sequence = np.random.SeedSequence(seed)
+
+    for start, chunk_seed in zip(
+        range(0, len(dates), chunk_days), seed_sequence.spawn(-(-len(dates) // chunk_days))
+    ):
+        rng = np.random.default_rng(chunk_seed)
+        block = dates[start:start + chunk_days]
+        n_rows = len(block) * cells_per_day
+
+        is_holiday = np.repeat((block.weekday == 6).astype(np.int64), cells_per_day)
+        base = rng.integers(50, 200, size=n_rows)
+        temperature = rng.normal(28, 5, size=n_rows).round(2)
+        variation = rng.normal(1.0, 0.1, size=n_rows)
+        units_sold = (base * variation * np.where(is_holiday == 1, 1.2, 1.0)).astype(np.int64)
+
+        yield pd.DataFrame({
+            'date': block.repeat(cells_per_day),
+            'store_id': pd.Categorical.from_codes(
+                np.tile(np.arange(len(stores)).repeat(len(items)), len(block)), stores
+            ),
+            'item_id': pd.Categorical.from_codes(
+                np.tile(np.arange(len(items)), len(block) * len(stores)), items
+            ),
+            'temperature': temperature,
+            'is_holiday': is_holiday,
+            'units_sold': units_sold,
+        })
+
+
+def write_data(chunks, path):
+    """
+    Write data chunks to a .csv or .parquet file as they are produced, so
+    only one chunk is held in memory. Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    is_parquet = os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+    sink = None if is_parquet else open(path, "wb")
+    writer = None
+    n_rows = 0
+    try:
+        for df in chunks:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.set_column(0, 'date', table['date'].cast(pa.date32()))
+            if writer is None:
+                if is_parquet:
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    # Unquoted, like pandas' to_csv; the names are generated
+                    # and never contain commas or quotes.
+                    sink.write((",".join(table.column_names) + "\n").encode())
+                    options = pa_csv.WriteOptions(include_header=False, quoting_style="none")
+                    writer = pa_csv.CSVWriter(sink, table.schema, write_options=options)
+            writer.write_table(table)
+            n_rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+    return n_rows
+
+
+def generate_data(start_date, end_date, n_stores=None, n_items=None, seed=None,
+                  path="historical_sales.csv", catalogue=None):
+    """Generate the sales history, write it to path and return it as one DataFrame."""
+    chunks = list(iter_data_chunks(
+        start_date, end_date, n_stores, n_items, seed, catalogue=catalogue
+    ))
+    write_data(chunks, path)
+    df = pd.concat(chunks, ignore_index=True)
+    df['store_id'] = df['store_id'].astype(str)
+    df['item_id'] = df['item_id'].astype(str)
     return df
 
-def preprocess(df):
+def preprocess(df, demand_features=False):
     df = df.copy()
     df['day_of_week'] = df['date'].dt.dayofweek
     df['month'] = df['date'].dt.month
+    if demand_features:
+        # Lags and rolling means of each row's (store, item) as of the day before.
+        store = DemandFeatureStore(pd.unique(df['store_id']), pd.unique(df['item_id']))
+        df[list(FEATURES)] = store.replay(df)
     df = pd.get_dummies(df, columns=['store_id', 'item_id'])
     return df
 
 if __name__ == "__main__":
-    df = generate_data("2024-10-01", "2024-12-31")
-    df['date'] = pd.to_datetime(df['date'])  # Ensure date column is datetime
-    print("✅ Dataset created and saved to 'historical_sales.csv'")
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate synthetic sales history.")
+    parser.add_argument("--start", default="2024-10-01")
+    parser.add_argument("--end", default="2024-12-31")
+    parser.add_argument("--stores", type=int, help="Number of stores (default: the catalogue's)")
+    parser.add_argument("--items", type=int, help="Number of items (default: the catalogue's)")
+    parser.add_argument("--catalogue", help="Catalogue .json/.csv file (default: catalogue.json)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--out", default="historical_sales.csv", help="Output .csv or .parquet file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    n_rows = write_data(
+        iter_data_chunks(
+            args.start, args.end, args.stores, args.items, args.seed, args.chunk_rows,
+            load_catalogue(args.catalogue),
+        ),
+        args.out,
+    )
+    elapsed = time.perf_counter() - started
+    print(f"✅ {n_rows:,} rows written to '{args.out}' in {elapsed:.1f}s")
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import zlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "historical_sales.csv")
+
+
+class FeatureProvider(ABC):
+    """
+    Source of the exogenous features the model needs but a request does not carry.
+
+    Implementations must be pure: the same (date, store) always yields the
+    same temperature, so a forecast depends only on the model, item, store
+    and date and can be cached or precomputed.
+    """
+
+    @abstractmethod
+    def temperature(self, dates, stores):
+        """
+        Return the temperature for each (dates[i], stores[i]) pair.
+
+        Parameters:
+            dates: DatetimeIndex of the rows being scored.
+            stores: Sequence of store names, the same length as dates.
+
+        Returns:
+            float array with one temperature per row.
+        """
+
+    @property
+    @abstractmethod
+    def cache_key(self):
+        """
+        Identifies the provider's configuration and data in forecast cache
+        keys and cube file names, so it must change whenever any
+        temperature it returns would.
+        """
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _splitmix64(x):
+    # uint64 arithmetic is meant to wrap around.
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _store_codes(stores):
+    codes, uniques = pd.factorize(pd.Index(stores, dtype=object), sort=False)
+    hashes = np.array([zlib.crc32(str(store).encode()) for store in uniques], dtype=np.uint64)
+    return hashes[codes]
+
+
+class SyntheticFeatureProvider(FeatureProvider):
+    """
+    Seeded stand-in for a weather feed, drawn from N(mean, std).
+
+    Each (date, store) cell is hashed with the seed instead of pulled from a
+    shared random stream, so the value does not depend on which other cells
+    are in the same request.
+    """
+
+    def __init__(self, seed=42, mean=30.0, std=5.0):
+        self.seed = seed
+        self.mean = mean
+        self.std = std
+
+    @property
+    def cache_key(self):
+        return f"synthetic:{self.seed}:{self.mean}:{self.std}"
+
+    def temperature(self, dates, stores):
+        days = pd.DatetimeIndex(dates).normalize().asi8 // 86_400_000_000_000
+        key = (days.astype(np.uint64) << np.uint64(32)) ^ _store_codes(stores)
+        key = key ^ _splitmix64(np.uint64(self.seed))
+
+        # Box-Muller on two independent 53-bit uniforms derived from the key.
+        h1 = _splitmix64(key)
+        h2 = _splitmix64(h1)
+        u1 = ((h1 >> np.uint64(11)).astype(np.float64) + 1.0) / 2.0**53
+        u2 = (h2 >> np.uint64(11)).astype(np.float64) / 2.0**53
+        z = np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+        return self.mean + self.std * z
+
+
+class ClimatologyFeatureProvider(FeatureProvider):
+    """
+    Mean historical temperature per store and calendar month.
+
+    Months or stores missing from the history fall back to the all-store
+    monthly mean, then to the overall mean.
+    """
+
+    def __init__(self, history):
+        history = history.assign(month=pd.to_datetime(history['date']).dt.month)
+        overall = history['temperature'].mean()
+        by_month = history.groupby('month')['temperature'].mean().reindex(range(1, 13)).fillna(overall)
+        by_store = (
+            history.groupby(['store_id', 'month'])['temperature'].mean()
+            .unstack('month')
+            .reindex(columns=range(1, 13))
+        )
+        store_means = by_store.to_numpy()
+        store_means = np.where(np.isnan(store_means), by_month.to_numpy(), store_means)
+
+        self.stores = pd.Index(by_store.index)
+        # The last row holds the all-store means, so the -1 that get_indexer
+        # returns for an unknown store selects it without a separate branch.
+        self.means = np.vstack([store_means, by_month.to_numpy()])
+
+    @classmethod
+    def from_csv(cls, path=DEFAULT_HISTORY_PATH):
+        return cls(pd.read_csv(path, usecols=['date', 'store_id', 'temperature']))
+
+    @property
+    def cache_key(self):
+        return f"climatology:{_digest(self.means.round(4).tobytes())}"
+
+    def temperature(self, dates, stores):
+        months = pd.DatetimeIndex(dates).month.to_numpy()
+        store_rows = self.stores.get_indexer(pd.Index(stores, dtype=object))
+        return self.means[store_rows, months - 1]
+
+
+class WeatherTableFeatureProvider(FeatureProvider):
+    """
+    Temperatures looked up from a local CSV or Parquet weather table.
+
+    The table needs date, store_id and temperature columns. Cells missing
+    from the table are filled by the fallback provider, or rejected when
+    there is none.
+    """
+
+    def __init__(self, table, fallback=None, name="table"):
+        table = table.assign(date=pd.to_datetime(table['date']).dt.normalize())
+        self.temperatures = (
+            table.drop_duplicates(['date', 'store_id'], keep='last')
+            .set_index(['date', 'store_id'])['temperature']
+            .astype(float)
+        )
+        self.fallback = fallback
+        self.name = name
+        self._digest = _digest(pd.util.hash_pandas_object(self.temperatures, index=True).to_numpy().tobytes())
+
+    @classmethod
+    def from_file(cls, path, fallback=None):
+        columns = ['date', 'store_id', 'temperature']
+        if path.endswith('.parquet'):
+            table = pd.read_parquet(path, columns=columns)
+        else:
+            table = pd.read_csv(path, usecols=columns)
+        return cls(table, fallback=fallback, name=os.path.basename(path))
+
+    @property
+    def cache_key(self):
+        fallback = self.fallback.cache_key if self.fallback is not None else None
+        return f"table:{self.name}:{self._digest}:{fallback}"
+
+    def temperature(self, dates, stores):
+        dates = pd.DatetimeIndex(dates).normalize()
+        stores = np.asarray(stores, dtype=object)
+        index = pd.MultiIndex.from_arrays([dates, stores])
+        values = self.temperatures.reindex(index).to_numpy()
+
+        missing = np.isnan(values)
+        if missing.any():
+            if self.fallback is None:
+                raise ValueError(
+                    f"No temperature in weather table for {int(missing.sum())} "
+                    f"(date, store) cells and no fallback provider configured"
+                )
+            values[missing] = self.fallback.temperature(dates[missing], stores[missing])
+        return values
+
+
+def make_feature_provider(source="synthetic"):
+    """
+    Build a provider from a short source spec.
+
+    "synthetic" (optionally "synthetic:<seed>"), "climatology", or a path to
+    a .csv/.parquet weather table, which falls back to climatology for
+    uncovered cells.
+    """
+    if source.startswith("synthetic"):
+        _, _, seed = source.partition(":")
+        return SyntheticFeatureProvider(seed=int(seed) if seed else 42)
+    if source == "climatology":
+        return ClimatologyFeatureProvider.from_csv()
+    return WeatherTableFeatureProvider.from_file(
+        source, fallback=ClimatologyFeatureProvider.from_csv()
+    )
@@ -0,0 +1,306 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Demand features, in the order tables and lookups return them. Lags are
+# the units sold that many days before the forecast day; means cover the
+# days just before it.
+FEATURES = ("lag_1", "lag_7", "lag_28", "rolling_mean_7", "rolling_mean_28")
+LAGS = (1, 7, 28)
+MEAN_WINDOWS = (7, 28)
+# Days of sales kept per (store, item): enough for the longest lag or mean.
+WINDOW = 28
+
+_NS_PER_DAY = 86_400_000_000_000
+
+
+def _day_numbers(dates):
+    return pd.DatetimeIndex(dates).normalize().asi8 // _NS_PER_DAY
+
+
+class DemandSnapshot:
+    """
+    The demand features of every (store, item), frozen: later sales go to
+    the store, never into a snapshot, so a model encoding with it sees one
+    consistent set of features.
+
+    table holds the features of the day after through, and history the
+    units sold on the WINDOW days up to through (NaN before the first
+    recorded day). Features of other days are read from history: a lag or
+    mean is the real value when every day it covers is in history, and
+    NaN (missing, to the model) when it covers a day after through. So a
+    forecast h days past the day after through keeps its lags longer than
+    h, e.g. lag_7 and lag_28 at h = 3, and loses lag_1 and the means
+    instead of seeing them h days stale.
+    """
+
+    def __init__(self, stores, items, table, through, version, history=None):
+        self.stores = stores
+        self.items = items
+        self.table = table
+        self.through = through
+        self.version = version
+        self.history = history
+        self.names = FEATURES
+        self._next_day = None if through is None else int(_day_numbers([through])[0]) + 1
+
+    def _horizons(self, dates):
+        """Days from the day after through to each of dates; all 0 if dates is None."""
+        if dates is None or self._next_day is None:
+            return None
+        return np.asarray(_day_numbers(dates), dtype=np.int64) - self._next_day
+
+    def _at(self, horizon, cells):
+        """Features for the day horizon days after the day after through, of table[cells]."""
+        if horizon == 0 or self.history is None:
+            return self.table[cells]
+        history = self.history[cells]
+        out = np.full(history.shape[:-1] + (len(FEATURES),), np.nan, dtype=np.float32)
+        # history[..., WINDOW - 1] is through; the forecast day is index WINDOW + horizon.
+        for column, lag in enumerate(LAGS):
+            index = WINDOW + horizon - lag
+            if 0 <= index < WINDOW:
+                out[..., column] = history[..., index]
+        for column, window in enumerate(MEAN_WINDOWS, start=len(LAGS)):
+            start, stop = WINDOW + horizon - window, WINDOW + horizon
+            if 0 <= start and stop <= WINDOW:
+                days = history[..., start:stop]
+                observed = np.count_nonzero(~np.isnan(days), axis=-1)
+                total = np.nansum(days, axis=-1)
+                out[..., column] = np.where(observed > 0, total / np.maximum(observed, 1), np.nan)
+        return out
+
+    def lookup(self, stores, items, dates=None):
+        """
+        Features of each (stores[i], items[i]) for dates[i] (default: the
+        day after through); NaN for names the store does not track.
+        """
+        store_codes = self.stores.get_indexer(pd.Index(stores, dtype=object))
+        item_codes = self.items.get_indexer(pd.Index(items, dtype=object))
+        out = np.full((len(store_codes), len(FEATURES)), np.nan, dtype=np.float32)
+        known = (store_codes >= 0) & (item_codes >= 0)
+        horizons = self._horizons(dates)
+        if horizons is None:
+            out[known] = self.table[store_codes[known], item_codes[known]]
+            return out
+        for horizon in np.unique(horizons[known]):
+            rows = known & (horizons == horizon)
+            out[rows] = self._at(int(horizon), (store_codes[rows], item_codes[rows]))
+        return out
+
+    def grid(self, stores, items, dates=None):
+        """
+        Features of every store x item, shape (len(stores), len(items),
+        len(FEATURES)) for the day after through, or with a leading date
+        axis, (len(dates), len(stores), len(items), len(FEATURES)), when
+        dates are given.
+        """
+        store_codes = self.stores.get_indexer(pd.Index(stores, dtype=object))
+        item_codes = self.items.get_indexer(pd.Index(items, dtype=object))
+        cells = np.ix_(store_codes, item_codes)
+        horizons = self._horizons(dates)
+        if horizons is None:
+            out = self._at(0, cells)
+            if dates is not None:
+                out = np.broadcast_to(out, (len(dates),) + out.shape).copy()
+        else:
+            shape = (len(horizons), len(store_codes), len(item_codes), len(FEATURES))
+            out = np.empty(shape, dtype=np.float32)
+            for horizon in np.unique(horizons):
+                out[horizons == horizon] = self._at(int(horizon), cells)
+        out[..., store_codes < 0, :, :] = np.nan
+        out[..., item_codes < 0, :] = np.nan
+        return out
+
+
+class DemandFeatureStore:
+    """
+    Lag and rolling-mean demand features per (store, item), kept up to date
+    as sales arrive instead of recomputed from the full history.
+
+    The last WINDOW days of units sold live in a ring buffer, one float32
+    array of shape (stores, items, WINDOW) indexed by day number modulo
+    WINDOW, with running sums for each mean window. Closing a day costs one
+    vectorised update of those arrays, and reading the features of a cell
+    a handful of indexed loads, however long the history.
+
+    Days up to through are complete. Sales of the day after it are held
+    apart until a later day arrives (or advance_to closes it), so features
+    never see a partly recorded day. Sales older than the window are
+    ignored.
+    """
+
+    def __init__(self, stores, items):
+        self.stores = pd.Index(list(stores), dtype=object)
+        self.items = pd.Index(list(items), dtype=object)
+        shape = (len(self.stores), len(self.items))
+        self._ring = np.zeros(shape + (WINDOW,), dtype=np.float32)
+        # Units are whole numbers, so float64 sums stay exact under the
+        # repeated adds and subtracts.
+        self._sums = {window: np.zeros(shape) for window in MEAN_WINDOWS}
+        self._pending = np.zeros(shape)
+        self._first_day = None
+        self._through = None
+        self._snapshot = None
+        self._lock = threading.RLock()
+        self.version = 0
+        self.ignored = 0
+
+    @classmethod
+    def from_catalogue(cls, catalogue):
+        return cls(catalogue.stores, catalogue.items)
+
+    @property
+    def through(self):
+        """The last complete day, or None before any sales."""
+        if self._through is None:
+            return None
+        return pd.Timestamp(self._through * _NS_PER_DAY)
+
+    def _codes(self, stores, items):
+        return (
+            self.stores.get_indexer(pd.Index(stores, dtype=object)),
+            self.items.get_indexer(pd.Index(items, dtype=object)),
+        )
+
+    def _start(self, first_day):
+        if self._through is None:
+            self._first_day = first_day
+            self._through = first_day - 1
+
+    def _changed(self):
+        self.version += 1
+        self._snapshot = None
+
+    def _close_days(self, day):
+        """Close every day up to day; the first gets the pending sales, the rest none."""
+        if self._through is None or day <= self._through:
+            return
+        if day - self._through > WINDOW:
+            # Even the pending day is out of the window.
+            self._ring[:] = 0
+            for total in self._sums.values():
+                total[:] = 0
+            self._pending[:] = 0
+            self._through = day
+            self._changed()
+            return
+        for d in range(self._through + 1, day + 1):
+            slot = d % WINDOW
+            for window, total in self._sums.items():
+                # Day d - window leaves the window as day d enters it.
+                total -= self._ring[..., (d - window) % WINDOW]
+            self._ring[..., slot] = self._pending
+            for total in self._sums.values():
+                total += self._pending
+            self._pending[:] = 0
+        self._through = day
+        self._changed()
+
+    def advance_to(self, date):
+        """Mark every day up to date complete, e.g. at the end of a business day."""
+        with self._lock:
+            self._close_days(int(_day_numbers([date])[0]))
+
+    def add(self, dates, stores, items, units):
+        """
+        Record units sold of items[i] in stores[i] on dates[i].
+
+        A date after the current day closes the days before it. Sales of
+        stores or items the store does not track, or older than the
+        window, are counted in ignored.
+        """
+        days = np.asarray(_day_numbers(dates), dtype=np.int64)
+        if not len(days):
+            return
+        store_codes, item_codes = self._codes(stores, items)
+        with self._lock:
+            self._start(int(days.min()))
+            self._close_days(int(days.max()) - 1)
+            self._record(days, store_codes, item_codes, np.asarray(units, dtype=np.float64))
+
+    def _record(self, days, store_codes, item_codes, units):
+        # Hold _lock, with every day before the newest of days closed.
+        known = (store_codes >= 0) & (item_codes >= 0)
+        current = known & (days == self._through + 1)
+        np.add.at(self._pending, (store_codes[current], item_codes[current]), units[current])
+
+        late = known & (days <= self._through) & (days > self._through - WINDOW)
+        if late.any():
+            cells = (store_codes[late], item_codes[late])
+            np.add.at(self._ring, cells + (days[late] % WINDOW,), units[late])
+            for window, total in self._sums.items():
+                in_window = days[late] > self._through - window
+                np.add.at(total, (cells[0][in_window], cells[1][in_window]), units[late][in_window])
+            self._first_day = min(self._first_day, int(days[late].min()))
+            self._changed()
+        self.ignored += int(len(days) - current.sum() - late.sum())
+
+    def _features(self, store_codes=slice(None), item_codes=slice(None)):
+        """Features for the day after through, for the given cells (default: all)."""
+        ring = self._ring[store_codes, item_codes]
+        out = np.empty(ring.shape[:-1] + (len(FEATURES),), dtype=np.float32)
+        if self._through is None:
+            out[:] = np.nan
+            return out
+        observed = self._through - self._first_day + 1
+        for column, lag in enumerate(LAGS):
+            if lag <= observed:
+                out[..., column] = ring[..., (self._through - lag + 1) % WINDOW]
+            else:
+                out[..., column] = np.nan
+        for column, window in enumerate(MEAN_WINDOWS, start=len(LAGS)):
+            total = self._sums[window][store_codes, item_codes]
+            out[..., column] = total / min(window, observed) if observed > 0 else np.nan
+        return out
+
+    def _history(self):
+        """Units sold on the WINDOW days up to through, oldest first; NaN before the first day."""
+        if self._through is None:
+            return None
+        days = np.arange(self._through - WINDOW + 1, self._through + 1)
+        history = self._ring[..., days % WINDOW]
+        history[..., days < self._first_day] = np.nan
+        return history
+
+    def snapshot(self):
+        """A frozen DemandSnapshot of the current features, rebuilt only after a change."""
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = DemandSnapshot(
+                    self.stores, self.items, self._features(), self.through, self.version,
+                    history=self._history(),
+                )
+            return self._snapshot
+
+    def replay(self, df):
+        """
+        Feed a sales history (date, store_id, item_id, units_sold) through
+        the store a day at a time and return the features each row had
+        before its own day's sales were added: what a forecast made the day
+        before would have seen.
+
+        Chunks of one long history can be replayed one after another, in
+        date order.
+
+        Returns:
+            float32 array of shape (len(df), len(FEATURES)), in df's row order.
+        """
+        days = np.asarray(_day_numbers(df['date']), dtype=np.int64)
+        store_codes, item_codes = self._codes(df['store_id'], df['item_id'])
+        units = df['units_sold'].to_numpy(dtype=np.float64)
+        out = np.full((len(days), len(FEATURES)), np.nan, dtype=np.float32)
+        order = np.argsort(days, kind="stable")
+        bounds = np.flatnonzero(np.diff(days[order])) + 1
+        with self._lock:
+            for rows in np.split(order, bounds):
+                if not len(rows):
+                    continue
+                day = int(days[rows[0]])
+                self._start(day)
+                self._close_days(day - 1)
+                known = rows[(store_codes[rows] >= 0) & (item_codes[rows] >= 0)]
+                out[known] = self._features(store_codes[known], item_codes[known])
+                self._record(days[rows], store_codes[rows], item_codes[rows], units[rows])
+        return out
@@ -0,0 +1,127 @@
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+_NS_PER_DAY = 86_400_000_000_000
+
+
+def _day_numbers(dates):
+    return pd.DatetimeIndex(dates).normalize().asi8 // _NS_PER_DAY
+
+
+class ForecastCube:
+    """
+    Precomputed predictions for every store x item x day of a fixed horizon.
+
+    data is a float32 array indexed by (store, item, day offset from start),
+    normally a read-only memory map, so every worker process that loads the
+    same cube file shares one copy through the page cache. path is that
+    file, or None for a cube only held in memory.
+    """
+
+    def __init__(self, data, start, stores, items, path=None):
+        self.data = data
+        self.path = path
+        self.start = pd.Timestamp(start).normalize()
+        self.stores = pd.Index(stores, dtype=object)
+        self.items = pd.Index(items, dtype=object)
+        self._start_day = _day_numbers([self.start])[0]
+
+    @property
+    def days(self):
+        return self.data.shape[2]
+
+    @classmethod
+    def build(cls, model, encoder, provider, start, days, stores, items):
+        """Score every cell of the horizon in one predict call."""
+        dates = pd.date_range(start=start, periods=days)
+        X, _ = encoder.encode_grid(dates, stores, items, provider)
+        predictions = model.predict(X).astype(np.float32)
+        # encode_grid rows are (date, store, item); store them store-major.
+        data = predictions.reshape(days, len(stores), len(items)).transpose(1, 2, 0)
+        return cls(np.ascontiguousarray(data), start, stores, items)
+
+    @staticmethod
+    def path_for(directory, version, start, days, stores, items):
+        """Cube file name, unique to everything the cube's contents depend on."""
+        key = repr((version, str(pd.Timestamp(start).date()), days, list(stores), list(items)))
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return os.path.join(directory, f"forecast_cube_{digest}.npy")
+
+    @classmethod
+    def materialize(cls, model, encoder, provider, version, start, days, stores, items, directory):
+        """
+        Load the cube for this model version and horizon, building and
+        saving it first if no worker has done so yet.
+        """
+        path = cls.path_for(directory, version, start, days, stores, items)
+        try:
+            return cls(np.load(path, mmap_mode="r"), start, stores, items, path)
+        except FileNotFoundError:
+            pass
+        cube = cls.build(model, encoder, provider, start, days, stores, items)
+        # Write under a private name and rename, so concurrent workers
+        # never load a partially written file.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, cube.data)
+        os.replace(tmp_path, path)
+        try:
+            data = np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            # Pruned by a worker serving other models before it was mapped.
+            return cube
+        return cls(data, start, stores, items, path)
+
+    @staticmethod
+    def prune(directory, keep):
+        """
+        Delete the cube files in directory other than the paths in keep:
+        those of past days, superseded models or feature providers.
+        Processes that already mapped one keep reading it.
+        """
+        keep = {os.path.abspath(path) for path in keep if path is not None}
+        for path in glob.glob(os.path.join(directory, "forecast_cube_*.npy")):
+            if os.path.abspath(path) not in keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def lookup(self, dates, stores, items, out):
+        """
+        Copy the cube's predictions for the covered (dates[i], stores[i],
+        items[i]) cells into out and return the boolean mask of those cells.
+        """
+        offsets = _day_numbers(dates) - self._start_day
+        store_rows = self.stores.get_indexer(pd.Index(stores, dtype=object))
+        item_rows = self.items.get_indexer(pd.Index(items, dtype=object))
+        covered = (store_rows >= 0) & (item_rows >= 0) & (offsets >= 0) & (offsets < self.days)
+        out[covered] = self.data[store_rows[covered], item_rows[covered], offsets[covered]]
+        return covered
+
+    def grid(self, dates, stores, items):
+        """
+        Predictions for a contiguous date range as a (date, store, item)
+        array, or None when the cube does not cover the whole grid.
+        """
+        dates = pd.DatetimeIndex(dates)
+        if len(dates) == 0:
+            return None
+        store_rows = self.stores.get_indexer(pd.Index(stores, dtype=object))
+        item_rows = self.items.get_indexer(pd.Index(items, dtype=object))
+        first = _day_numbers(dates[:1])[0] - self._start_day
+        contiguous = (dates == pd.date_range(start=dates[0], periods=len(dates))).all()
+        if (
+            not contiguous
+            or (store_rows < 0).any()
+            or (item_rows < 0).any()
+            or first < 0
+            or first + len(dates) > self.days
+        ):
+            return None
+        block = self.data[:, :, first:first + len(dates)][np.ix_(store_rows, item_rows)]
+        return block.transpose(2, 0, 1)
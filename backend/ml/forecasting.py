@@ -1,58 +1,253 @@
-
 import pandas as pd
 import numpy as np
 
-def align_columns(input_df, reference_columns):
-    for col in reference_columns:
-        if col not in input_df.columns:
-            input_df[col] = 0
-    return input_df[reference_columns]
 
-def forecast_future(model, X_columns, start_date, end_date):
+def grid_keys(dates, stores, items):
+    """
+    Row keys of the date-major (date, store, item) grid used by encode_grid.
+
+    store_id and item_id are categoricals built from integer codes, so no
+    per-row Python string is created and columnar encoders (Arrow,
+    Parquet) can write them as dictionary arrays without conversion.
+    """
+    dates = pd.DatetimeIndex(dates)
+    n_stores, n_items = len(stores), len(items)
+    return pd.DataFrame({
+        'date': dates.repeat(n_stores * n_items),
+        'store_id': pd.Categorical.from_codes(
+            np.tile(np.arange(n_stores).repeat(n_items), len(dates)), categories=list(stores)
+        ),
+        'item_id': pd.Categorical.from_codes(
+            np.tile(np.arange(n_items), len(dates) * n_stores), categories=list(items)
+        ),
+    })
+
+
+class UnknownCategoryError(ValueError):
+    """Raised when a store or item has no one-hot column in the model input."""
+
+
+class FeatureEncoder:
+    """
+    Column layout of the model input, compiled once from X_columns.
+
+    Knows the position of every numeric feature and the one-hot slot of each
+    store and item the model was trained on, so encoding a request is one
+    np.zeros allocation followed by a few indexed writes.
+
+    Stores and items are resolved through the dense codes of catalogue (an
+    ml.catalogue.Catalogue, or anything with stores and items indexes); by
+    default the stores and items of X_columns, in column order.
+
+    Any other columns are demand features (lags, rolling means). They are
+    read from demand, an ml.feature_store.DemandSnapshot, unless the
+    caller passes their values.
+    """
+
+    STORE_PREFIX = 'store_id_'
+    ITEM_PREFIX = 'item_id_'
+
+    NUMERIC_FEATURES = ('temperature', 'is_holiday', 'day_of_week', 'month')
+
+    def __init__(self, X_columns, catalogue=None, demand=None):
+        self.columns = list(X_columns)
+        positions = {col: i for i, col in enumerate(self.columns)}
+        try:
+            self.temperature = positions['temperature']
+            self.is_holiday = positions['is_holiday']
+            self.day_of_week = positions['day_of_week']
+            self.month = positions['month']
+        except KeyError as exc:
+            raise ValueError(f"Model columns are missing feature {exc}") from None
+
+        store_slots = {
+            col[len(self.STORE_PREFIX):]: i
+            for col, i in positions.items() if col.startswith(self.STORE_PREFIX)
+        }
+        item_slots = {
+            col[len(self.ITEM_PREFIX):]: i
+            for col, i in positions.items() if col.startswith(self.ITEM_PREFIX)
+        }
+        store_names = catalogue.stores if catalogue is not None else list(store_slots)
+        item_names = catalogue.items if catalogue is not None else list(item_slots)
+        self.store_index = pd.Index(store_names, dtype=object)
+        self.item_index = pd.Index(item_names, dtype=object)
+        # One-hot column of each catalogue code, -1 for names the model
+        # was not trained on.
+        self.store_slot_by_code = np.array(
+            [store_slots.get(name, -1) for name in self.store_index], dtype=np.intp
+        )
+        self.item_slot_by_code = np.array(
+            [item_slots.get(name, -1) for name in self.item_index], dtype=np.intp
+        )
+        self.stores = self.store_index[self.store_slot_by_code >= 0].tolist()
+        self.items = self.item_index[self.item_slot_by_code >= 0].tolist()
+
+        self.demand_columns = [
+            col for col in self.columns
+            if col not in self.NUMERIC_FEATURES
+            and not col.startswith((self.STORE_PREFIX, self.ITEM_PREFIX))
+        ]
+        self._demand_slots = [positions[col] for col in self.demand_columns]
+        self.demand = demand if self.demand_columns else None
+        if self.demand is not None:
+            missing = sorted(set(self.demand_columns) - set(demand.names))
+            if missing:
+                raise ValueError(f"Demand features {missing} are not provided by the feature store")
+            self._demand_fields = [demand.names.index(col) for col in self.demand_columns]
+        # Part of any cache key for this encoder's predictions.
+        self.demand_key = self.demand.version if self.demand is not None else None
+
+    @property
+    def n_features(self):
+        return len(self.columns)
+
+    def store_columns(self, stores):
+        """Return the one-hot column of each store, rejecting unknown stores."""
+        return self._slots(self.store_index, self.store_slot_by_code, stores, self.stores, 'store')
+
+    def item_columns(self, items):
+        """Return the one-hot column of each item, rejecting unknown items."""
+        return self._slots(self.item_index, self.item_slot_by_code, items, self.items, 'item')
+
+    @staticmethod
+    def _slots(index, slot_by_code, values, known, kind):
+        values = pd.Index(values, dtype=object)
+        codes = index.get_indexer(values)
+        slots = np.where(codes >= 0, slot_by_code[codes], -1)
+        unknown = np.flatnonzero(slots < 0)
+        if len(unknown):
+            expected = f"one of {sorted(known)}" if len(known) <= 50 else f"one of {len(known)} {kind}s"
+            raise UnknownCategoryError(f"Unknown {kind} {values[unknown[0]]!r}; expected {expected}")
+        return slots
+
+    def _demand_source(self):
+        if self.demand is None:
+            raise ValueError(
+                f"The model needs demand features {self.demand_columns}; "
+                "pass their values or a feature store snapshot"
+            )
+        return self.demand
+
+    def _write_date_features(self, X, day_of_week, month):
+        X[..., self.is_holiday] = day_of_week == 6
+        X[..., self.day_of_week] = day_of_week
+        X[..., self.month] = month
+
+    def encode_grid(self, dates, stores, items, provider=None):
+        """
+        Build the model input for every (date, store, item) combination.
+
+        Rows are laid out date-major, then store, then item, and columns
+        follow X_columns, so the result can be passed straight to
+        model.predict. Temperatures come from provider (an
+        ml.feature_providers.FeatureProvider); without one they are drawn
+        at random as before.
+
+        Returns:
+            X: float32 array of shape (len(dates) * len(stores) * len(items), n_features).
+            keys: DataFrame with the date, store_id and item_id of each row.
+        """
+        dates = pd.DatetimeIndex(dates)
+        store_cols = self.store_columns(stores)
+        item_cols = self.item_columns(items)
+        shape = (len(dates), len(stores), len(items))
+
+        X = np.zeros(shape + (self.n_features,), dtype=np.float32)
+        if provider is None:
+            X[..., self.temperature] = np.random.normal(30, 5, size=shape)
+        else:
+            # Temperature depends on (date, store) only; broadcast over items.
+            temperature = provider.temperature(dates.repeat(len(stores)), np.tile(stores, len(dates)))
+            X[..., self.temperature] = temperature.reshape(len(dates), len(stores), 1)
+        self._write_date_features(
+            X, dates.dayofweek.to_numpy()[:, None, None], dates.month.to_numpy()[:, None, None]
+        )
+        X[:, np.arange(len(stores)), :, store_cols] = 1
+        X[:, :, np.arange(len(items)), item_cols] = 1
+        if self.demand_columns:
+            # Lags and means as of each date; see DemandSnapshot.
+            features = self._demand_source().grid(stores, items, dates)[..., self._demand_fields]
+            X[..., self._demand_slots] = features
+
+        return X.reshape(-1, self.n_features), grid_keys(dates, stores, items)
+
+    def encode_rows(self, dates, stores, items, provider=None, temperature=None, demand=None):
+        """
+        Build the model input for parallel sequences of dates, stores and items.
+
+        Unlike encode_grid, row i scores (dates[i], stores[i], items[i]), so
+        arbitrary tuples can be scored together in one model.predict call.
+        Observed temperatures, e.g. from a sales history, take precedence
+        over provider, and demand (an array with one column per
+        demand_columns entry) over the encoder's feature store snapshot.
+        """
+        dates = pd.DatetimeIndex(dates)
+        n_rows = len(dates)
+        if not (len(stores) == len(items) == n_rows):
+            raise ValueError("dates, stores and items must have the same length")
+        rows = np.arange(n_rows)
+
+        X = np.zeros((n_rows, self.n_features), dtype=np.float32)
+        if temperature is not None:
+            X[:, self.temperature] = temperature
+        elif provider is None:
+            X[:, self.temperature] = np.random.normal(30, 5, size=n_rows)
+        else:
+            X[:, self.temperature] = provider.temperature(dates, stores)
+        self._write_date_features(X, dates.dayofweek.to_numpy(), dates.month.to_numpy())
+        X[rows, self.store_columns(stores)] = 1
+        X[rows, self.item_columns(items)] = 1
+        if demand is not None:
+            X[:, self._demand_slots] = demand
+        elif self.demand_columns:
+            features = self._demand_source().lookup(stores, items, dates)
+            X[:, self._demand_slots] = features[:, self._demand_fields]
+        return X
+
+    def encode_history(self, df, demand=None):
+        """
+        Model input for the rows of a sales history (date, store_id, item_id,
+        temperature, is_holiday columns), as preprocess would build it.
+        """
+        X = self.encode_rows(
+            df['date'], df['store_id'], df['item_id'], temperature=df['temperature'].to_numpy(),
+            demand=demand,
+        )
+        X[:, self.is_holiday] = df['is_holiday'].to_numpy()
+        return X
+
+    def with_features(self, keys, X):
+        """Attach the numeric features of X to the row keys, as forecast_future returns them."""
+        df = keys.copy()
+        df['temperature'] = X[:, self.temperature].astype(float)
+        df['is_holiday'] = X[:, self.is_holiday].astype(int)
+        df['day_of_week'] = X[:, self.day_of_week].astype(int)
+        df['month'] = X[:, self.month].astype(int)
+        return df
+
+
+def as_encoder(X_columns, catalogue=None):
+    """Accept either the raw X_columns list or an already compiled FeatureEncoder."""
+    if isinstance(X_columns, FeatureEncoder):
+        return X_columns
+    return FeatureEncoder(X_columns, catalogue)
+
+
+def forecast_future(model, X_columns, start_date, end_date, provider=None, catalogue=None):
+    encoder = as_encoder(X_columns, catalogue)
     future_dates = pd.date_range(start=start_date, end=end_date)
-    cities = ['Kolkata', 'Asansol', 'Durgapur', 'Siliguri', 'Howrah']
-    items = ['Rice', 'Wheat', 'Sugar', 'Salt', 'Oil', 'Milk', 'Potato', 'Onion', 'Dal', 'Atta']
-
-    future_data = []
-    for date in future_dates:
-        for store in cities:
-            for item in items:
-                temp = np.random.normal(30, 5)
-                is_holiday = int(date.weekday() == 6)
-                future_data.append({
-                    'date': date,
-                    'store_id': store,
-                    'item_id': item,
-                    'temperature': temp,
-                    'is_holiday': is_holiday,
-                    'day_of_week': date.weekday(),
-                    'month': date.month
-                })
-
-    df = pd.DataFrame(future_data)
-    df_encoded = pd.get_dummies(df, columns=['store_id', 'item_id'])
-    df_encoded = align_columns(df_encoded, X_columns)
-    df['predicted_units'] = model.predict(df_encoded)
+    X, keys = encoder.encode_grid(future_dates, encoder.stores, encoder.items, provider)
+
+    df = encoder.with_features(keys, X)
+    df['predicted_units'] = model.predict(X)
     return df
 
-def forecast_item_store_single_day(model, X_columns, item, store, date_str):
-    date = pd.to_datetime(date_str)
-    temp = np.random.normal(30, 5)
-    is_holiday = int(date.weekday() == 6)
-
-    df = pd.DataFrame([{
-        'date': date,
-        'store_id': store,
-        'item_id': item,
-        'temperature': temp,
-        'is_holiday': is_holiday,
-        'day_of_week': date.weekday(),
-        'month': date.month
-    }])
-
-    df_encoded = pd.get_dummies(df, columns=['store_id', 'item_id'])
-    df_encoded = align_columns(df_encoded, X_columns)
-    prediction = model.predict(df_encoded)[0]
+def forecast_item_store_single_day(model, X_columns, item, store, date_str, provider=None,
+                                   catalogue=None):
+    encoder = as_encoder(X_columns, catalogue)
+    X, _ = encoder.encode_grid([pd.to_datetime(date_str)], [store], [item], provider)
+    prediction = model.predict(X)[0]
 
     return {
         'date': date_str,
@@ -61,31 +256,23 @@ def forecast_item_store_single_day(model, X_columns, item, store, date_str):
         'predicted_units_sold': round(prediction)
     }
 
-def forecast_monthly_demand_for_store(model, X_columns, store, year, month):
+def month_dates(year, month):
+    """All calendar days of the given month."""
     start_date = pd.to_datetime(f"{year}-{month:02d}-01")
     end_date = start_date + pd.offsets.MonthEnd(0)
-    dates = pd.date_range(start=start_date, end=end_date)
-    items = ['Rice', 'Wheat', 'Sugar', 'Salt', 'Oil', 'Milk', 'Potato', 'Onion', 'Dal', 'Atta']
-
-    data = []
-    for date in dates:
-        for item in items:
-            temp = np.random.normal(30, 5)
-            is_holiday = int(date.weekday() == 6)
-            data.append({
-                'date': date,
-                'store_id': store,
-                'item_id': item,
-                'temperature': temp,
-                'is_holiday': is_holiday,
-                'day_of_week': date.weekday(),
-                'month': date.month
-            })
-
-    df = pd.DataFrame(data)
-    df_encoded = pd.get_dummies(df, columns=['store_id', 'item_id'])
-    df_encoded = align_columns(df_encoded, X_columns)
-    df['predicted_units'] = model.predict(df_encoded)
-
-    total = df.groupby('item_id')['predicted_units'].sum().round().astype(int).reset_index()
+    return pd.date_range(start=start_date, end=end_date)
+
+def monthly_totals(df):
+    """Sum daily predicted_units per item into rounded monthly totals."""
+    total = df.groupby('item_id', observed=True)['predicted_units'].sum().round().astype(int)
+    total.index = total.index.astype(str)
+    total = total.sort_index().reset_index()
     return total.rename(columns={'item_id': 'item', 'predicted_units': 'forecasted_units'})
+
+def forecast_monthly_demand_for_store(model, X_columns, store, year, month, provider=None,
+                                      catalogue=None):
+    encoder = as_encoder(X_columns, catalogue)
+    X, keys = encoder.encode_grid(month_dates(year, month), [store], encoder.items, provider)
+
+    keys['predicted_units'] = model.predict(X)
+    return monthly_totals(keys)
@@ -0,0 +1,209 @@
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ml.feature_providers import make_feature_provider
+from ml.feature_store import FEATURES, WINDOW, DemandFeatureStore
+from ml.forecasting import FeatureEncoder, UnknownCategoryError
+from ml.loader import COLUMNS_FILE, MODEL_FILE, native_model_path
+
+# Boosting rounds added per update, and the parameters they are grown with.
+ROUNDS = 20
+PARAMS = {
+    "objective": "reg:squarederror",
+    "tree_method": "hist",
+    "eta": 0.05,
+    "max_depth": 6,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "seed": 42,
+}
+
+def _daily_out_query(since, until):
+    """Units sold per day and inventory item name, on days after since and before until."""
+    from sqlalchemy import Date, func, select
+
+    from models.database import InventoryItem, StockTransaction
+
+    day = func.date(StockTransaction.timestamp, type_=Date)
+    query = (
+        select(day.label("date"), InventoryItem.name.label("item_id"),
+               func.sum(StockTransaction.quantity).label("units_sold"))
+        .join(InventoryItem, InventoryItem.id == StockTransaction.item_id)
+        .where(StockTransaction.transaction_type == "OUT")
+        .group_by(day, InventoryItem.name)
+    )
+    if since is not None:
+        query = query.where(day > since)
+    if until is not None:
+        query = query.where(day < until)
+    return query
+
+
+def _as_date(value):
+    """A date from a date, datetime or ISO string, e.g. a trained_through watermark."""
+    return None if value is None else pd.Timestamp(value).date()
+
+
+def load_daily_sales(connectable, since=None, until=None):
+    """
+    Daily units sold per inventory item name, from the OUT stock
+    transactions of the days after since and before until (both dates,
+    unbounded if None). Pass today as until to read only closed days.
+
+    Returns:
+        sales: DataFrame with date, item_id and units_sold columns.
+        watermark: The last day included, as a date, or None.
+    """
+    with connectable.connect() as connection:
+        df = pd.read_sql(_daily_out_query(_as_date(since), _as_date(until)), connection)
+    if df.empty:
+        return df[['date', 'item_id', 'units_sold']], None
+    df['date'] = pd.to_datetime(df['date'])
+    return df[['date', 'item_id', 'units_sold']], df['date'].max().date()
+
+
+def sales_demand_features(connectable, sales, store, items, since=None, until=None):
+    """
+    Demand features of each sales row, replaying the WINDOW days of sales
+    up to since as well so the first rows have their lags.
+    """
+    context_since = None if since is None else _as_date(since) - timedelta(days=WINDOW)
+    context, _ = load_daily_sales(connectable, context_since, until)
+    context['store_id'] = store
+    features = DemandFeatureStore([store], items).replay(context)
+    table = pd.DataFrame(features, columns=FEATURES, index=pd.MultiIndex.from_frame(context[['date', 'item_id']]))
+    return table.reindex(pd.MultiIndex.from_frame(sales[['date', 'item_id']])).to_numpy(dtype=np.float32)
+
+
+def update_booster(booster, X_columns, sales, store, provider, rounds=ROUNDS, params=None, demand=None):
+    """
+    Continue boosting booster on daily sales of one store.
+
+    Sales of items the model has no column for are dropped, since a warm
+    start cannot add input features; they need a full retrain. Models with
+    demand features need their values for each sales row in demand.
+
+    Returns:
+        The updated booster and the number of sales rows used.
+    """
+    import xgboost as xgb
+
+    encoder = FeatureEncoder(X_columns)
+    known = sales['item_id'].isin(encoder.items).to_numpy()
+    sales = sales[known]
+    if sales.empty:
+        raise ValueError("None of the sold items are known to the model")
+    if demand is not None:
+        demand = demand[known][:, [FEATURES.index(col) for col in encoder.demand_columns]]
+    stores = [store] * len(sales)
+    try:
+        X = encoder.encode_rows(sales['date'], stores, sales['item_id'].tolist(), provider, demand=demand)
+    except UnknownCategoryError as exc:
+        raise ValueError(f"Cannot attribute sales to store {store!r}: {exc}") from None
+    dtrain = xgb.DMatrix(
+        X, label=sales['units_sold'].to_numpy(dtype=np.float32), feature_names=encoder.columns
+    )
+    updated = xgb.train({**PARAMS, **(params or {})}, dtrain, num_boost_round=rounds, xgb_model=booster)
+    return updated, len(sales)
+
+
+def incremental_update(registry, connectable, store, parent=None, rounds=ROUNDS, provider=None,
+                       promote=False, today=None):
+    """
+    Build a new model version from parent (default: the registry's current
+    one) by boosting more rounds on the OUT transactions of the days after
+    the last one parent was trained on, up to yesterday.
+
+    Only closed days (before today, in UTC like the transaction
+    timestamps) are trained on, so a day is never trained on twice or
+    only in part; its last day becomes the new version's trained_through.
+
+    Inventory items are matched to forecast items by name. Stock
+    transactions carry no store, so all of them are attributed to store.
+
+    Returns:
+        The new version's name and a report of what was trained on.
+    """
+    import xgboost as xgb
+    from xgboost import XGBRegressor
+
+    started = time.perf_counter()
+    parent = parent or registry.current()
+    parent_metadata = registry.verify(parent)
+    parent_dir = registry.path(parent)
+    X_columns = joblib.load(os.path.join(parent_dir, COLUMNS_FILE))
+    model_path = native_model_path(directory=parent_dir)
+    if model_path is None:
+        booster = joblib.load(os.path.join(parent_dir, MODEL_FILE)).get_booster()
+    else:
+        booster = xgb.Booster(model_file=model_path)
+
+    since = _as_date(parent_metadata.get("trained_through"))
+    until = today or datetime.now(timezone.utc).date()
+    sales, watermark = load_daily_sales(connectable, since, until)
+    if watermark is None:
+        raise ValueError(
+            f"No OUT transactions between {since or 'the beginning'} and {until}; nothing to train on"
+        )
+
+    demand = None
+    encoder = FeatureEncoder(X_columns)
+    if encoder.demand_columns:
+        demand = sales_demand_features(connectable, sales, store, encoder.items, since, until)
+
+    provider = provider or make_feature_provider(os.environ.get("FORECAST_FEATURE_PROVIDER", "synthetic"))
+    booster, n_rows = update_booster(booster, X_columns, sales, store, provider, rounds, demand=demand)
+
+    model = XGBRegressor()
+    model.load_model(bytearray(booster.save_raw("json")))
+    report = {
+        "source": "incremental",
+        "parent": parent,
+        "store": store,
+        "rounds": rounds,
+        "rows": n_rows,
+        "skipped_rows": len(sales) - n_rows,
+        "trained_through": watermark.isoformat(),
+    }
+    with tempfile.TemporaryDirectory() as staging:
+        joblib.dump(model, os.path.join(staging, MODEL_FILE))
+        joblib.dump(X_columns, os.path.join(staging, COLUMNS_FILE))
+        booster.save_model(os.path.join(staging, "xgb_model.json"))
+        version = registry.register(staging, metadata=report, promote=promote)
+    report["wall_time_s"] = time.perf_counter() - started
+    return version, report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from ml.model_registry import ModelRegistry
+    from models.database import engine
+
+    parser = argparse.ArgumentParser(
+        description="Continue training the forecasting model on new OUT stock transactions."
+    )
+    parser.add_argument("--store", default=os.environ.get("FORECAST_INVENTORY_STORE"),
+                        help="Store the inventory database belongs to (FORECAST_INVENTORY_STORE)")
+    parser.add_argument("--parent", help="Version to continue from (default: the current one)")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--promote", action="store_true", help="Make the new version the default")
+    args = parser.parse_args()
+    if not args.store:
+        parser.error("--store (or FORECAST_INVENTORY_STORE) is required")
+
+    registry = ModelRegistry.from_env()
+    registry.ensure_seeded()
+    version, report = incremental_update(
+        registry, engine, args.store, args.parent, args.rounds, promote=args.promote
+    )
+    print(
+        f"✅ Registered model {version}: {report['rounds']} rounds on {report['rows']} daily sales "
+        f"rows from {report['parent']} ({report['skipped_rows']} skipped) in {report['wall_time_s']:.1f}s"
+    )
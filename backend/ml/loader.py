@@ -1,19 +1,115 @@
+import hashlib
 import joblib
 import os
 
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+MODEL_FILE = "xgb_model.pkl"
+COLUMNS_FILE = "xgb_model_columns.pkl"
+# Native XGBoost formats, preferred in this order when present.
+NATIVE_MODEL_FILES = ["xgb_model.ubj", "xgb_model.json"]
+MODEL_PATH = os.path.join(DIR_PATH, MODEL_FILE)
+COLUMNS_PATH = os.path.join(DIR_PATH, COLUMNS_FILE)
+NATIVE_MODEL_PATHS = [os.path.join(DIR_PATH, name) for name in NATIVE_MODEL_FILES]
+# Node tables compiled from xgb_model.json for the "mmap" backend.
+TREE_TABLES_DIR = "tree_tables"
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 def load_model():
     """
     Load the saved XGBoost model and feature columns from disk.
-    
+
     Returns:
         model: The loaded XGBoost model.
         X_columns: The list of feature column names used for training.
     """
-    dir_path = os.path.dirname(os.path.realpath(__file__))
-    model_path = os.path.join(dir_path, "xgb_model.pkl")
-    columns_path = os.path.join(dir_path, "xgb_model_columns.pkl")
-    
-    model = joblib.load(model_path)
-    X_columns = joblib.load(columns_path)
-    
-    return model, X_columns
\ No newline at end of file
+    model = joblib.load(MODEL_PATH)
+    X_columns = joblib.load(COLUMNS_PATH)
+
+    return model, X_columns
+
+
+def native_model_path(json_only=False, directory=DIR_PATH):
+    """Path of the saved native booster, or None if there is none."""
+    for name in NATIVE_MODEL_FILES:
+        if json_only and not name.endswith(".json"):
+            continue
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_predictor(backend="booster", directory=DIR_PATH):
+    """
+    Load the model behind a uniform predict(X) / set_threads(n) interface.
+
+    Backends:
+        "sklearn": the pickled XGBRegressor and its predict.
+        "booster": a native Booster scored with inplace_predict, loaded from
+            xgb_model.ubj/.json, or taken from the pickle if neither exists.
+        "numpy": the trees in xgb_model.json evaluated with NumPy only;
+            xgboost is never imported.
+        "mmap": like "numpy", but the node tables are compiled once into
+            tree_tables/ and memory-mapped read-only, so every worker
+            process shares a single copy. They are recompiled when
+            xgb_model.json no longer matches the hash they were built from.
+
+    The files are read from directory, by default this one; a model
+    registry version directory has the same layout.
+
+    Returns:
+        predictor: Object with predict(X) and set_threads(n).
+        X_columns: The list of feature column names used for training.
+        source: Path of the model file the predictor was loaded from.
+    """
+    from ml.tree_inference import BoosterPredictor, NumpyTreeEnsemble, SklearnPredictor
+
+    model_path = os.path.join(directory, MODEL_FILE)
+    X_columns = joblib.load(os.path.join(directory, COLUMNS_FILE))
+    if backend == "sklearn":
+        return SklearnPredictor(joblib.load(model_path)), X_columns, model_path
+    if backend == "booster":
+        path = native_model_path(directory=directory)
+        if path is None:
+            return BoosterPredictor(joblib.load(model_path).get_booster()), X_columns, model_path
+        return BoosterPredictor.from_file(path), X_columns, path
+    if backend in ("numpy", "mmap"):
+        path = native_model_path(json_only=True, directory=directory)
+        if path is None:
+            raise FileNotFoundError(
+                f"The {backend} backend needs xgb_model.json; create it with export_native_model()"
+            )
+        if backend == "numpy":
+            return NumpyTreeEnsemble.from_json(path), X_columns, path
+        tables = os.path.join(directory, TREE_TABLES_DIR)
+        source = _sha256(path)
+        if NumpyTreeEnsemble.source_of(tables) != source:
+            NumpyTreeEnsemble.from_json(path).save(tables, source)
+        return NumpyTreeEnsemble.load(tables), X_columns, path
+    raise ValueError(f"Unknown model backend {backend!r}; expected sklearn, booster, numpy or mmap")
+
+
+def export_native_model(model=None, fmt="json"):
+    """
+    Save the pickled model's booster in XGBoost's native format next to it.
+
+    Returns:
+        The path written.
+    """
+    if model is None:
+        model, _ = load_model()
+    path = os.path.join(DIR_PATH, f"xgb_model.{fmt}")
+    model.get_booster().save_model(path)
+    return path
+
+
+if __name__ == "__main__":
+    print(f"✅ Native model written to {export_native_model()}")
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from ml.loader import COLUMNS_FILE, DIR_PATH, MODEL_FILE, NATIVE_MODEL_FILES, load_predictor
+
+REGISTRY_PATH = os.path.join(DIR_PATH, "registry")
+# Files copied into a version directory, when present in the source.
+ARTIFACT_FILES = [MODEL_FILE, *NATIVE_MODEL_FILES, COLUMNS_FILE]
+METADATA_FILE = "metadata.json"
+CURRENT_FILE = "CURRENT"
+
+_VERSION_PATTERN = re.compile(r"^v(\d+)$")
+
+
+class UnknownModelVersionError(LookupError):
+    """Raised for a model version that is not in the registry."""
+
+
+class ModelValidationError(ValueError):
+    """Raised when a model version fails its checksum or smoke prediction."""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _combined_checksum(file_checksums):
+    digest = hashlib.sha256()
+    for name in sorted(file_checksums):
+        digest.update(f"{name}:{file_checksums[name]}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def smoke_test(predictor, X_columns):
+    """
+    Score one row per store with the model and check the predictions are
+    finite numbers, so a broken artifact is caught before it serves traffic.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from ml.forecasting import FeatureEncoder
+
+    encoder = FeatureEncoder(X_columns)
+    if not encoder.stores or not encoder.items:
+        raise ModelValidationError("Model columns have no store_id_* or item_id_* features")
+    dates = pd.DatetimeIndex(["2025-01-01"] * len(encoder.stores))
+    # Demand features, if the model has any, are those of a store with no sales yet.
+    demand = np.full((len(dates), len(encoder.demand_columns)), np.nan, dtype=np.float32)
+    X = encoder.encode_rows(dates, encoder.stores, [encoder.items[0]] * len(encoder.stores), demand=demand)
+    predictions = np.asarray(predictor.predict(X))
+    if predictions.shape != (len(X),) or not np.isfinite(predictions).all():
+        raise ModelValidationError(
+            f"Smoke prediction failed: expected {len(X)} finite values, got {predictions!r}"
+        )
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts on disk.
+
+    Each version is a directory v1, v2, ... holding the model files (in the
+    same layout as this package's xgb_model.* files) and metadata.json with
+    the per-file sha256 checksums. Version directories are written under a
+    temporary name and renamed into place, so a half-written version is
+    never visible. CURRENT names the version served by default.
+    """
+
+    def __init__(self, root=REGISTRY_PATH):
+        self.root = root
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get("FORECAST_MODEL_REGISTRY") or REGISTRY_PATH)
+
+    def path(self, version):
+        """
+        Directory of version. Names are client input (e.g. a forecast
+        route's model_version), so anything but v<number> is rejected
+        before it reaches the filesystem.
+        """
+        if not isinstance(version, str) or not _VERSION_PATTERN.fullmatch(version):
+            raise UnknownModelVersionError(f"Invalid model version {version!r}; expected v<number>")
+        return os.path.join(self.root, version)
+
+    def versions(self):
+        """Registered version names, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        numbered = [
+            (int(match.group(1)), name)
+            for name in os.listdir(self.root)
+            if (match := _VERSION_PATTERN.match(name))
+            and os.path.exists(os.path.join(self.root, name, METADATA_FILE))
+        ]
+        return [name for _, name in sorted(numbered)]
+
+    def metadata(self, version):
+        try:
+            with open(os.path.join(self.path(version), METADATA_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UnknownModelVersionError(
+                f"Unknown model version {version!r}; registered: {self.versions()}"
+            ) from None
+
+    def current(self):
+        """The version served by default: CURRENT, else the newest one."""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            versions = self.versions()
+            return versions[-1] if versions else None
+
+    def promote(self, version):
+        """Make version the default, atomically replacing CURRENT."""
+        self.metadata(version)
+        self._write_atomic(CURRENT_FILE, version + "\n")
+
+    def register(self, source_dir=DIR_PATH, metadata=None, promote=False):
+        """
+        Copy the model artifacts in source_dir into a new version.
+
+        Returns:
+            The new version's name.
+        """
+        files = [name for name in ARTIFACT_FILES if os.path.exists(os.path.join(source_dir, name))]
+        if COLUMNS_FILE not in files or len(files) < 2:
+            raise FileNotFoundError(f"No model and column files to register in {source_dir}")
+
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.root, prefix=".staging-")
+        try:
+            checksums = {}
+            for name in files:
+                shutil.copyfile(os.path.join(source_dir, name), os.path.join(staging, name))
+                checksums[name] = _sha256(os.path.join(staging, name))
+            while True:
+                versions = self.versions()
+                version = f"v{int(versions[-1][1:]) + 1 if versions else 1}"
+                record = {
+                    **(metadata or {}),
+                    "version": version,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "files": checksums,
+                    "checksum": _combined_checksum(checksums),
+                }
+                with open(os.path.join(staging, METADATA_FILE), "w") as f:
+                    json.dump(record, f, indent=2)
+                try:
+                    # Fails if another process registered this number first.
+                    os.rename(staging, self.path(version))
+                    break
+                except OSError:
+                    if not os.path.exists(self.path(version)):
+                        raise
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if promote:
+            self.promote(version)
+        return version
+
+    def ensure_seeded(self):
+        """Register this package's xgb_model.* files as v1 if the registry is empty."""
+        if not self.versions():
+            self.register(DIR_PATH, metadata={"source": "bundled"}, promote=True)
+
+    def verify(self, version):
+        """Recompute the artifact checksums; raise ModelValidationError on mismatch."""
+        record = self.metadata(version)
+        for name, expected in record["files"].items():
+            if _sha256(os.path.join(self.path(version), name)) != expected:
+                raise ModelValidationError(f"Checksum mismatch for {name} in model {version}")
+        return record
+
+    def load(self, version=None, backend="booster"):
+        """
+        Load, checksum and smoke-test a version (default: current()).
+
+        Returns:
+            predictor: Object with predict(X) and set_threads(n).
+            X_columns: The list of feature column names used for training.
+            metadata: The version's metadata.json contents.
+        """
+        version = version or self.current()
+        if version is None:
+            raise UnknownModelVersionError(f"No model versions registered in {self.root}")
+        record = self.verify(version)
+        predictor, X_columns, _ = load_predictor(backend, directory=self.path(version))
+        smoke_test(predictor, X_columns)
+        return predictor, X_columns, record
+
+    def _write_atomic(self, name, text):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f".{name}-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, os.path.join(self.root, name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage versioned forecasting models.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    register = commands.add_parser("register", help="Register the model files in a directory")
+    register.add_argument("source_dir", nargs="?", default=DIR_PATH)
+    register.add_argument("--promote", action="store_true", help="Also make it the default version")
+    register.add_argument("--note", help="Free-text note stored in the metadata")
+    promote = commands.add_parser("promote", help="Make a version the default")
+    promote.add_argument("version")
+    commands.add_parser("list", help="List registered versions")
+    args = parser.parse_args()
+
+    registry = ModelRegistry.from_env()
+    if args.command == "register":
+        metadata = {"source": os.path.abspath(args.source_dir)}
+        if args.note:
+            metadata["note"] = args.note
+        version = registry.register(args.source_dir, metadata, promote=args.promote)
+        print(f"✅ Registered model {version}")
+    elif args.command == "promote":
+        registry.promote(args.version)
+        print(f"✅ {args.version} is now the default model")
+    else:
+        current = registry.current()
+        for version in registry.versions():
+            record = registry.metadata(version)
+            marker = "*" if version == current else " "
+            print(f"{marker} {version}  {record['created_at']}  {record['checksum']}  {record.get('note', '')}")
@@ -1,42 +1,260 @@
 # 2_model_training.py
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
 import pandas as pd
 import joblib
+import xgboost as xgb
 from xgboost import XGBRegressor
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error
+from sklearn.metrics import root_mean_squared_error
+from catalogue import Catalogue
 from data_creation import preprocess  # ✅ now valid
+from feature_store import FEATURES, DemandFeatureStore
+from forecasting import FeatureEncoder
+
+PARAMS = {
+    "n_estimators": 200,
+    "learning_rate": 0.1,
+    "max_depth": 6,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "random_state": 42,
+}
+CHUNK_ROWS = 100_000
+NUMERIC_FEATURES = ['temperature', 'is_holiday', 'day_of_week', 'month']
+
+
+def save_model(model, X_columns):
+    joblib.dump(model, "xgb_model.pkl")
+    joblib.dump(X_columns, "xgb_model_columns.pkl")
+    # Native format for the API's booster and pure-NumPy inference backends.
+    model.get_booster().save_model("xgb_model.json")
+    print("✅ Model and column list saved to disk.")
+    print("   Register it for the API with: python -m ml.model_registry register --promote (from backend/)")
+
 
-def train_model(csv_path="historical_sales.csv"):
+def train_model(csv_path="historical_sales.csv", demand_features=False):
     df = pd.read_csv(csv_path)
     df['date'] = pd.to_datetime(df['date'])
 
-    df_processed = preprocess(df)
+    df_processed = preprocess(df, demand_features)
     X = df_processed.drop(columns=['date', 'units_sold'])
     y = df_processed['units_sold']
 
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    model = XGBRegressor(
-        n_estimators=200,
-        learning_rate=0.1,
-        max_depth=6,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=42,
-        n_jobs=-1
-    )
+    model = XGBRegressor(**PARAMS, n_jobs=-1)
 
     model.fit(X_train, y_train)
     predictions = model.predict(X_test)
 
-    rmse = mean_squared_error(y_test, predictions, squared=False)
+    rmse = root_mean_squared_error(y_test, predictions)
     print(f"✅ XGBoost Model RMSE: {rmse:.2f}")
-    joblib.dump(model, "xgb_model.pkl")
-    joblib.dump(X.columns.tolist(), "xgb_model_columns.pkl")
-    print("✅ Model and column list saved to disk.")
+    save_model(model, X.columns.tolist())
     return model, X.columns.tolist(), df
-    
+
+
+def iter_history(path, chunk_rows=CHUNK_ROWS, columns=None):
+    """Read a .csv or .parquet sales history chunk_rows rows at a time."""
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            df = batch.to_pandas()
+            df['date'] = pd.to_datetime(df['date'])
+            yield df
+    else:
+        for df in pd.read_csv(path, chunksize=chunk_rows, usecols=columns):
+            df['date'] = pd.to_datetime(df['date'])
+            yield df
+
+
+def scan_history(path, chunk_rows=CHUNK_ROWS):
+    """
+    One pass over the date, store and item columns only.
+
+    Returns:
+        catalogue: Every store and item in the history, in order of first appearance.
+        first_date, last_date: The date range covered.
+    """
+    stores, items = {}, {}
+    first_date, last_date = None, None
+    for df in iter_history(path, chunk_rows, columns=['date', 'store_id', 'item_id']):
+        stores.update(dict.fromkeys(pd.unique(df['store_id'].astype(str))))
+        items.update(dict.fromkeys(pd.unique(df['item_id'].astype(str))))
+        low, high = df['date'].min(), df['date'].max()
+        first_date = low if first_date is None else min(first_date, low)
+        last_date = high if last_date is None else max(last_date, high)
+    return Catalogue(stores, items), first_date, last_date
+
+
+def feature_columns(catalogue, demand_features=False):
+    """X_columns in the layout preprocess + get_dummies produces: one-hot columns sorted by name."""
+    return (
+        NUMERIC_FEATURES
+        + (list(FEATURES) if demand_features else [])
+        + [f"store_id_{store}" for store in sorted(catalogue.stores)]
+        + [f"item_id_{item}" for item in sorted(catalogue.items)]
+    )
+
+
+class HistoryIter(xgb.DataIter):
+    """
+    Feeds XGBoost one encoded chunk of the history at a time.
+
+    Only rows whose date falls in [start, end) are used. XGBoost may reset
+    and replay the iterator several times while building its quantile
+    sketch, so chunks are re-read from disk rather than kept. When the
+    encoder has demand features, every pass replays the whole history
+    through a fresh feature store, so rows in the window see the days
+    before it too.
+    """
+
+    def __init__(self, path, encoder, start=None, end=None, chunk_rows=CHUNK_ROWS, cache_prefix=None):
+        self.path = path
+        self.encoder = encoder
+        self.start = start
+        self.end = end
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def chunks(self):
+        """Encoded (X, y) of each chunk in the date window."""
+        demand = None
+        if self.encoder.demand_columns:
+            demand = DemandFeatureStore(self.encoder.store_index, self.encoder.item_index)
+        for df in iter_history(self.path, self.chunk_rows):
+            features = demand.replay(df) if demand is not None else None
+            in_window = np.ones(len(df), dtype=bool)
+            if self.start is not None:
+                in_window &= (df['date'] >= self.start).to_numpy()
+            if self.end is not None:
+                in_window &= (df['date'] < self.end).to_numpy()
+            df = df[in_window]
+            if len(df):
+                X = self.encoder.encode_history(df, features[in_window] if features is not None else None)
+                yield X, df['units_sold'].to_numpy(dtype=np.float32)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = self.chunks()
+            self.rows = 0
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        X, y = chunk
+        self.rows += len(y)
+        input_data(data=X, label=y)
+        return True
+
+    def reset(self):
+        self._chunks = None
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def train_model_streaming(data_path="historical_sales.csv", holdout_days=14, chunk_rows=CHUNK_ROWS,
+                          external_memory=False, catalogue=None, params=None, demand_features=False):
+    """
+    Train on a history too large for memory, streaming it in chunks.
+
+    The first pass collects the store/item vocabulary (unless a catalogue
+    fixes it) and the date range. The last holdout_days days are held out
+    for evaluation instead of a random split, so the model is scored on
+    days after those it was trained on. Training data reaches XGBoost
+    through a DataIter: a QuantileDMatrix keeps only the quantized
+    features in memory, and external_memory=True pages even those to a
+    temporary directory (ExtMemQuantileDMatrix).
+
+    Returns:
+        model: The trained XGBRegressor.
+        X_columns: The list of feature column names used for training.
+        report: RMSE, row counts, wall time and peak RSS.
+    """
+    started = time.perf_counter()
+    params = {**PARAMS, **(params or {})}
+    scanned, first_date, last_date = scan_history(data_path, chunk_rows)
+    catalogue = catalogue or scanned
+    X_columns = feature_columns(catalogue, demand_features)
+    encoder = FeatureEncoder(X_columns)
+    cutoff = last_date.normalize() - pd.Timedelta(days=holdout_days - 1)
+    if cutoff <= first_date:
+        raise ValueError(f"History {first_date.date()}..{last_date.date()} is too short for a {holdout_days}-day holdout")
+
+    booster_params = {
+        "objective": "reg:squarederror",
+        "tree_method": "hist",
+        "eta": params["learning_rate"],
+        "max_depth": params["max_depth"],
+        "subsample": params["subsample"],
+        "colsample_bytree": params["colsample_bytree"],
+        "seed": params["random_state"],
+    }
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_prefix = os.path.join(cache_dir, "train") if external_memory else None
+        train_iter = HistoryIter(data_path, encoder, end=cutoff, chunk_rows=chunk_rows, cache_prefix=cache_prefix)
+        if external_memory:
+            dtrain = xgb.ExtMemQuantileDMatrix(train_iter)
+        else:
+            dtrain = xgb.QuantileDMatrix(train_iter)
+        booster = xgb.train(booster_params, dtrain, num_boost_round=params["n_estimators"])
+        del dtrain
+
+    # Score the holdout chunk by chunk too.
+    holdout = HistoryIter(data_path, encoder, start=cutoff, chunk_rows=chunk_rows)
+    squared_error, n_holdout = 0.0, 0
+    for X, y in holdout.chunks():
+        predictions = booster.inplace_predict(X)
+        squared_error += float(np.square(predictions - y, dtype=np.float64).sum())
+        n_holdout += len(y)
+
+    model = XGBRegressor(**params)
+    model.load_model(bytearray(booster.save_raw("json")))
+    report = {
+        "rmse": float(np.sqrt(squared_error / n_holdout)) if n_holdout else float("nan"),
+        "train_rows": train_iter.rows,
+        "holdout_rows": n_holdout,
+        "holdout_start": str(cutoff.date()),
+        "wall_time_s": time.perf_counter() - started,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    print(
+        f"✅ XGBoost Model RMSE on the last {holdout_days} days: {report['rmse']:.2f} "
+        f"({report['train_rows']:,} training rows, {report['holdout_rows']:,} holdout rows)"
+    )
+    print(f"⏱️  Wall time {report['wall_time_s']:.1f}s, peak RSS {report['peak_rss_mb']:.0f} MiB")
+    return model, X_columns, report
+
 
 if __name__ == "__main__":
-    model, X_cols, df = train_model()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the demand forecasting model.")
+    parser.add_argument("--data", default="historical_sales.csv", help="Sales history .csv or .parquet")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Stream the history in chunks instead of loading it whole")
+    parser.add_argument("--external-memory", action="store_true",
+                        help="With --streaming, page the quantized data to disk as well")
+    parser.add_argument("--holdout-days", type=int, default=14)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--demand-features", action="store_true",
+                        help="Add lag and rolling-mean demand features (see feature_store.py)")
+    args = parser.parse_args()
 
+    if args.streaming or args.external_memory:
+        model, X_cols, _ = train_model_streaming(
+            args.data, args.holdout_days, args.chunk_rows, args.external_memory,
+            demand_features=args.demand_features,
+        )
+        save_model(model, X_cols)
+    else:
+        model, X_cols, df = train_model(args.data, args.demand_features)
@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+class SklearnPredictor:
+    """The joblib-pickled XGBRegressor, scored through the sklearn wrapper."""
+
+    backend = "sklearn"
+
+    def __init__(self, model):
+        self.model = model
+
+    def set_threads(self, n_threads):
+        self.model.set_params(n_jobs=n_threads)
+
+    def predict(self, X):
+        return self.model.predict(X)
+
+
+class BoosterPredictor:
+    """
+    A native XGBoost Booster scored with inplace_predict.
+
+    Skips the sklearn wrapper's input checks and the DMatrix construction;
+    XGBoost reads the contiguous float32 array directly.
+    """
+
+    backend = "booster"
+
+    def __init__(self, booster):
+        self.booster = booster
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a booster saved with save_model (.json or .ubj)."""
+        import xgboost
+
+        booster = xgboost.Booster()
+        booster.load_model(path)
+        return cls(booster)
+
+    def set_threads(self, n_threads):
+        self.booster.set_param({"nthread": n_threads})
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self.booster.inplace_predict(X, validate_features=False)
+
+
+class NumpyTreeEnsemble:
+    """
+    Pure-NumPy evaluator for a gradient-boosted regression tree ensemble.
+
+    Compiled from XGBoost's JSON model dump into padded (tree, node) arrays,
+    so the API can score without importing xgboost. All trees advance one
+    level per step for every row at once, so the Python loop runs max-depth
+    times regardless of the number of rows or trees.
+    """
+
+    backend = "numpy"
+    # Node tables written by save(), one .npy file each.
+    TABLES = ("left", "right", "feature", "threshold", "default_left", "value")
+
+    def __init__(self, left, right, feature, threshold, default_left, value, base_score, max_depth):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.value = value
+        self.base_score = base_score
+        self.max_depth = max_depth
+        self._left = left.reshape(-1)
+        self._right = right.reshape(-1)
+        self._feature = feature.reshape(-1)
+        self._threshold = threshold.reshape(-1)
+        self._default_left = default_left.reshape(-1)
+        self._value = value.reshape(-1)
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as f:
+            learner = json.load(f)["learner"]
+
+        objective = learner["objective"]["name"]
+        if objective != "reg:squarederror":
+            raise ValueError(f"NumpyTreeEnsemble only supports reg:squarederror, got {objective}")
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+
+        trees = learner["gradient_booster"]["model"]["trees"]
+        if any(tree["categories_nodes"] for tree in trees):
+            raise ValueError("NumpyTreeEnsemble does not support categorical splits")
+        n_nodes = max(len(tree["left_children"]) for tree in trees)
+        shape = (len(trees), n_nodes)
+
+        left = np.zeros(shape, dtype=np.int32)
+        right = np.zeros(shape, dtype=np.int32)
+        feature = np.zeros(shape, dtype=np.int32)
+        threshold = np.zeros(shape, dtype=np.float32)
+        default_left = np.zeros(shape, dtype=bool)
+        value = np.zeros(shape, dtype=np.float32)
+        max_depth = 0
+        for t, tree in enumerate(trees):
+            n = len(tree["left_children"])
+            children = np.array(tree["left_children"])
+            is_leaf = children == -1
+            node_ids = np.arange(n)
+            # Leaves point at themselves, so extra steps leave them in place.
+            left[t, :n] = np.where(is_leaf, node_ids, children)
+            right[t, :n] = np.where(is_leaf, node_ids, tree["right_children"])
+            feature[t, :n] = tree["split_indices"]
+            threshold[t, :n] = tree["split_conditions"]
+            default_left[t, :n] = np.array(tree["default_left"], dtype=bool)
+            # XGBoost stores a leaf's output in its split_conditions slot.
+            value[t, :n] = np.where(is_leaf, tree["split_conditions"], 0.0)
+            max_depth = max(max_depth, _tree_depth(tree["left_children"], tree["right_children"]))
+
+        return cls(left, right, feature, threshold, default_left, value, base_score, max_depth)
+
+    def save(self, directory, source=None):
+        """
+        Write the node tables as .npy files plus a JSON header to directory.
+
+        source identifies the model the tables were compiled from (e.g. a
+        hash of its JSON) and is recorded in the header; see source_of.
+        The directory is written under a temporary name and renamed into
+        place, so concurrent workers never load a partial one. If another
+        process got there first with the same source, its copy is kept;
+        tables of another source are replaced, and processes that already
+        mapped them keep reading the old files.
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        staging = tempfile.mkdtemp(dir=parent, prefix=".tree-tables-")
+        try:
+            for name in self.TABLES:
+                np.save(os.path.join(staging, f"{name}.npy"), getattr(self, name))
+            with open(os.path.join(staging, "header.json"), "w") as f:
+                json.dump({"base_score": self.base_score, "max_depth": self.max_depth, "source": source}, f)
+            try:
+                os.rename(staging, directory)
+            except OSError:
+                if not os.path.exists(directory) or self.source_of(directory) == source:
+                    raise
+                stale = f"{staging}.stale"
+                os.rename(directory, stale)
+                os.rename(staging, directory)
+                shutil.rmtree(stale, ignore_errors=True)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            installed = os.path.exists(os.path.join(directory, "header.json"))
+            if not installed or self.source_of(directory) != source:
+                raise
+
+    @staticmethod
+    def source_of(directory):
+        """The source recorded by save() in directory, or None if it holds no tables."""
+        try:
+            with open(os.path.join(directory, "header.json")) as f:
+                return json.load(f).get("source")
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Load tables written by save(). With mmap, they are read-only memory
+        maps, so every process serving the same files shares one copy of
+        the model through the page cache.
+        """
+        with open(os.path.join(directory, "header.json")) as f:
+            header = json.load(f)
+        tables = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in cls.TABLES
+        }
+        return cls(**tables, base_score=header["base_score"], max_depth=header["max_depth"])
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.TABLES)
+
+    def set_threads(self, n_threads):
+        pass
+
+    # Rows scored per pass; keeps the (rows, trees) working arrays in cache.
+    BLOCK_ROWS = 512
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if len(X) <= self.BLOCK_ROWS:
+            return self._predict_block(X)
+        return np.concatenate([
+            self._predict_block(X[start:start + self.BLOCK_ROWS])
+            for start in range(0, len(X), self.BLOCK_ROWS)
+        ])
+
+    def _predict_block(self, X):
+        n_rows, n_features = X.shape
+        n_trees, n_nodes = self.left.shape
+        flat_X = X.reshape(-1)
+        # Track nodes as flat offsets into the (tree, node) tables and the
+        # features as flat offsets into X, so each step is plain 1-D takes.
+        tree_offsets = np.arange(n_trees, dtype=np.int64) * n_nodes
+        row_offsets = np.arange(n_rows, dtype=np.int64)[:, None] * n_features
+        node = np.broadcast_to(tree_offsets, (n_rows, n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offsets + self._feature.take(node))
+            go_left = np.where(np.isnan(x), self._default_left.take(node), x < self._threshold.take(node))
+            node = tree_offsets + np.where(go_left, self._left.take(node), self._right.take(node))
+        margin = self._value.take(node).sum(axis=1, dtype=np.float64)
+        return (margin + self.base_score).astype(np.float32)
+
+
+def _tree_depth(left_children, right_children):
+    max_depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if left_children[node] == -1:
+            max_depth = max(max_depth, depth)
+        else:
+            stack.append((left_children[node], depth + 1))
+            stack.append((right_children[node], depth + 1))
+    return max_depth
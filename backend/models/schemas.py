@@ -1,14 +1,8 @@
-from pydantic import BaseModel, Field, field_validator
-from datetime import datetime, timezone
+from pydantic import BaseModel, Field, field_validator, model_validator
+from datetime import date, datetime, timezone
 from enum import Enum
-
-
-class Store(str, Enum):
-    KOLKATA = "Kolkata"
-    ASANSOL = "Asansol"
-    DURGAPUR = "Durgapur"
-    SILIGURI = "Siliguri"
-    HOWRAH = "Howrah"
+from itertools import product
+from typing import Dict, List
 
 
 class TransactionType(str, Enum):
@@ -23,6 +17,14 @@ class AlertType(str, Enum):
     OVERSTOCK = "OVERSTOCK"
 
 
+class ForecastFormat(str, Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+    CSV = "csv"
+    ARROW = "arrow"
+    PARQUET = "parquet"
+
+
 class BaseSchema(BaseModel):
     class Config:
         from_attributes = True
@@ -88,8 +90,8 @@ class StockTransactionCreate(BaseSchema):
     performed_by: str | None = None
 
     @field_validator("quantity")
-    def validate_quantity(cls, v, values):
-        transaction_type = values.get("transaction_type")
+    def validate_quantity(cls, v, info):
+        transaction_type = info.data.get("transaction_type")
         if transaction_type in [TransactionType.IN, TransactionType.OUT] and v <= 0:
             raise ValueError("Quantity must be positive")
         return v
@@ -107,6 +109,38 @@ class StockTransactionResponse(BaseSchema):
     timestamp: datetime
 
 
+class BulkMode(str, Enum):
+    ATOMIC = "atomic"  # Apply every transaction or none of them
+    BEST_EFFORT = "best_effort"  # Apply the valid ones, report the rest
+
+
+MAX_BULK_TRANSACTIONS = 10_000
+
+
+class StockTransactionBulkCreate(BaseSchema):
+    """Schema for a batch of stock transactions, applied in list order"""
+
+    transactions: List[StockTransactionCreate] = Field(min_length=1, max_length=MAX_BULK_TRANSACTIONS)
+    mode: BulkMode = BulkMode.ATOMIC
+
+
+class StockTransactionBulkResult(BaseSchema):
+    """Outcome of one transaction of a batch; index is its position in the request"""
+
+    index: int
+    success: bool
+    transaction: StockTransactionResponse | None = None
+    error: str | None = None
+
+
+class StockTransactionBulkResponse(BaseSchema):
+    mode: BulkMode
+    committed: bool
+    succeeded: int
+    failed: int
+    results: List[StockTransactionBulkResult]
+
+
 # Stock Alert Schema
 class StockAlert(BaseSchema):
     """Schema for stock alerts"""
@@ -129,21 +163,37 @@ class InventoryStats(BaseSchema):
 
 
 # Forecasting Schemas
+# Stores and items are plain names, checked against the forecasting
+# catalogue when the request is scored (unknown names answer 400).
+# Dates are checked here, so bad ones answer 422 before any scoring and
+# before a streamed response has sent its 200.
+def _check_date(v: str) -> str:
+    try:
+        date.fromisoformat(v)
+    except ValueError:
+        raise ValueError("Dates must be YYYY-MM-DD") from None
+    return v
+
+
 class ForecastInputSingleDay(BaseModel):
     item: str
-    store: Store
+    store: str
     date: str  # YYYY-MM-DD
 
+    @field_validator("date")
+    def validate_date(cls, v):
+        return _check_date(v)
+
 
 class ForecastOutputSingleDay(BaseModel):
     date: str
-    store: Store
+    store: str
     item: str
     predicted_units_sold: int
 
 
 class ForecastInputMonthly(BaseModel):
-    store: Store
+    store: str
     year: int
     month: int
 
@@ -157,10 +207,14 @@ class ForecastInputDateRange(BaseModel):
     start_date: str  # YYYY-MM-DD
     end_date: str  # YYYY-MM-DD
 
+    @field_validator("start_date", "end_date")
+    def validate_date(cls, v):
+        return _check_date(v)
+
 
 class ForecastOutputDateRange(BaseModel):
     date: datetime
-    store_id: Store
+    store_id: str
     item_id: str
     predicted_units: float
 
@@ -168,3 +222,111 @@ class ForecastOutputDateRange(BaseModel):
 class ForecastInputSingleDayAllStores(BaseModel):
     item: str
     date: str  # YYYY-MM-DD
+
+    @field_validator("date")
+    def validate_date(cls, v):
+        return _check_date(v)
+
+
+class ForecastGrid(BaseModel):
+    """Shorthand for every item x store x date combination."""
+
+    items: List[str] = Field(min_length=1)
+    stores: List[str] = Field(min_length=1)
+    dates: List[str] = Field(min_length=1)  # YYYY-MM-DD
+
+    @field_validator("dates")
+    def validate_dates(cls, v):
+        return [_check_date(d) for d in v]
+
+
+MAX_FORECAST_BATCH_CELLS = 100_000
+
+
+class ForecastInputBatch(BaseModel):
+    rows: List[ForecastInputSingleDay] = Field(default=[], max_length=MAX_FORECAST_BATCH_CELLS)
+    grid: ForecastGrid | None = None
+
+    @model_validator(mode="after")
+    def validate_not_empty(self):
+        if not self.rows and self.grid is None:
+            raise ValueError("Provide at least one of 'rows' or 'grid'")
+        return self
+
+    @model_validator(mode="after")
+    def validate_cells(self):
+        cells = len(self.rows)
+        if self.grid is not None:
+            cells += len(self.grid.items) * len(self.grid.stores) * len(self.grid.dates)
+        if cells > MAX_FORECAST_BATCH_CELLS:
+            raise ValueError(
+                f"Request covers {cells} forecasts; at most {MAX_FORECAST_BATCH_CELLS} are allowed"
+            )
+        return self
+
+    def expand(self):
+        """Flatten rows and grid into parallel item, store and date lists."""
+        items = [row.item for row in self.rows]
+        stores = [row.store for row in self.rows]
+        dates = [row.date for row in self.rows]
+        if self.grid is not None:
+            for item, store, date in product(
+                self.grid.items, self.grid.stores, self.grid.dates
+            ):
+                items.append(item)
+                stores.append(store)
+                dates.append(date)
+        return items, stores, dates
+
+
+class ForecastCacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    size: int
+    maxsize: int | None = None  # None until the forecasting stack is loaded
+    ttl_seconds: float | None = None
+
+
+class ForecastExecutorStats(BaseModel):
+    max_workers: int
+    max_queue: int
+    model_threads: int
+    in_flight: int
+    rejected: int
+
+
+class ForecastBatcherStats(BaseModel):
+    window_ms: float
+    max_batch: int
+    max_queued: int
+    queued: int
+    rejected: int
+    requests: int
+    batches: int
+    p50_ms: float
+    p99_ms: float
+    batch_size_histogram: Dict[str, int]
+    latency_ms_histogram: Dict[str, int]
+
+
+class ForecastModelVersion(BaseModel):
+    version: str
+    created_at: datetime
+    checksum: str
+    note: str | None = None
+    default: bool
+    resident: bool
+    active: bool
+
+
+class ForecastCatalogue(BaseModel):
+    stores: List[str]
+    items: List[str]
+
+
+class ReadinessStatus(BaseModel):
+    inventory_ready: bool
+    forecast_warm: bool
+    forecast_warmup: str
+    forecast_error: str | None = None
@@ -0,0 +1,129 @@
+import io
+import json
+
+from models.schemas import ForecastFormat
+
+MEDIA_TYPES = {
+    ForecastFormat.JSON: "application/json",
+    ForecastFormat.NDJSON: "application/x-ndjson",
+    ForecastFormat.CSV: "text/csv",
+    ForecastFormat.ARROW: "application/vnd.apache.arrow.stream",
+    ForecastFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+JSON_STREAM_CHUNK_SIZE = 1000
+
+
+def negotiate_format(format: ForecastFormat | None, accept: str | None) -> ForecastFormat:
+    """
+    Pick the response format: an explicit format parameter wins, otherwise
+    the first media type in the Accept header that we can produce, otherwise JSON.
+    """
+    if format is not None:
+        return format
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        for fmt, candidate in MEDIA_TYPES.items():
+            if media_type == candidate:
+                return fmt
+    return ForecastFormat.JSON
+
+
+def stream_json_array(records, chunk_size=JSON_STREAM_CHUNK_SIZE):
+    """Serialize a list of dicts as a JSON array, a chunk of records at a time."""
+    yield "["
+    for start in range(0, len(records), chunk_size):
+        chunk = json.dumps(records[start:start + chunk_size])[1:-1]
+        yield ("," if start else "") + chunk
+    yield "]"
+
+
+def _ndjson_chunks(frames, empty=None):
+    for df in frames:
+        if len(df):
+            lines = df.to_json(orient="records", lines=True, date_format="iso", date_unit="s")
+            yield lines if lines.endswith("\n") else lines + "\n"
+
+
+def _csv_chunks(frames, empty=None):
+    header = True
+    for df in frames:
+        yield df.to_csv(index=False, header=header, date_format="%Y-%m-%dT%H:%M:%S")
+        header = False
+    if header and empty is not None:
+        yield empty.to_csv(index=False)
+
+
+def _arrow_schema(empty):
+    import pyarrow as pa
+
+    return None if empty is None else pa.Schema.from_pandas(empty, preserve_index=False)
+
+
+def _arrow_chunks(frames, empty=None):
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    schema = _arrow_schema(empty)
+    writer = None if schema is None else pa.ipc.new_stream(sink, schema)
+    for df in frames:
+        batch = pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False)
+        if writer is None:
+            schema = batch.schema
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(batch)
+        yield _drain(sink)
+    if writer is not None:
+        writer.close()
+        yield _drain(sink)
+
+
+def _parquet_chunks(frames, empty=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Each frame becomes a row group; the footer is only written on close,
+    # but row group bytes are sent as soon as they are encoded.
+    sink = io.BytesIO()
+    schema = _arrow_schema(empty)
+    writer = None if schema is None else pq.ParquetWriter(sink, schema)
+    for df in frames:
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        if writer is None:
+            schema = table.schema
+            writer = pq.ParquetWriter(sink, schema)
+        writer.write_table(table)
+        yield _drain(sink)
+    if writer is not None:
+        writer.close()
+        yield _drain(sink)
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+_ENCODERS = {
+    ForecastFormat.NDJSON: _ndjson_chunks,
+    ForecastFormat.CSV: _csv_chunks,
+    ForecastFormat.ARROW: _arrow_chunks,
+    ForecastFormat.PARQUET: _parquet_chunks,
+}
+
+
+def stream_frames(frames, fmt: ForecastFormat, empty=None):
+    """
+    Encode an iterable of result DataFrames as they arrive, so the first
+    chunk is sent before later ones have been scored.
+
+    empty is a zero-row frame with the results' columns and dtypes. When
+    given, Arrow and Parquet output is written with its schema from the
+    start and CSV output gets its header, so a result without any rows is
+    still a readable file.
+    """
+    if fmt == ForecastFormat.JSON:
+        raise ValueError("JSON responses are not streamed frame by frame")
+    return _ENCODERS[fmt](frames, empty)
@@ -1,53 +1,558 @@
-from ml.loader import load_model
+import os
+import threading
+from contextlib import contextmanager
+
+from cachetools import LRUCache, TTLCache
+from fastapi import HTTPException
+
+from ml.catalogue import Catalogue, load_catalogue
+from ml.loader import DIR_PATH
+from ml.model_registry import ModelRegistry, ModelValidationError, UnknownModelVersionError
+from ml.feature_providers import make_feature_provider
+from ml.feature_store import DemandFeatureStore
+from ml.forecast_cube import ForecastCube
 from ml.forecasting import (
-    forecast_item_store_single_day as forecast_single,
-    forecast_monthly_demand_for_store as forecast_monthly,
-    forecast_future as forecast_range,
+    FeatureEncoder,
+    UnknownCategoryError,
+    grid_keys,
+    month_dates,
+    monthly_totals,
 )
+import numpy as np
 import pandas as pd
-from models.schemas import Store
+from models.database import engine
+from services.inference import forecast_executor
+
+_NS_PER_DAY = 86_400_000_000_000
+
+
+@contextmanager
+def _unknown_category_as_400():
+    """Report stores/items the model was not trained on as a bad request."""
+    try:
+        yield
+    except UnknownCategoryError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@contextmanager
+def _unknown_model_version_as_404():
+    """Report model versions missing from the registry, or failing validation."""
+    try:
+        yield
+    except UnknownModelVersionError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except ModelValidationError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+class PredictionCache:
+    """
+    Bounded, thread-safe cache of raw model predictions.
+
+    Keys are (model version, item, store, day) tuples. Entries are evicted
+    least-recently-used first and, when ttl is set, expire after ttl seconds.
+    A maxsize of 0 disables caching.
+    """
+
+    def __init__(self, maxsize=100_000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cells = self._new_cells()
+
+    @classmethod
+    def from_env(cls):
+        ttl = os.environ.get("FORECAST_CACHE_TTL")
+        return cls(
+            maxsize=int(os.environ.get("FORECAST_CACHE_SIZE", 100_000)),
+            ttl=float(ttl) if ttl else None,
+        )
+
+    def _new_cells(self):
+        if self.maxsize <= 0:
+            return {}
+        if self.ttl:
+            return TTLCache(self.maxsize, self.ttl)
+        return LRUCache(self.maxsize)
+
+    def get_many(self, keys):
+        """Return the cached value for each key, NaN where it is not cached."""
+        values = np.full(len(keys), np.nan)
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._cells.get(key)
+                if value is not None:
+                    values[i] = value
+            hits = int(np.count_nonzero(~np.isnan(values)))
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return values
+
+    def put_many(self, keys, values):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._cells[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._cells = self._new_cells()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._cells),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+            }
+
+
+class ResidentModel:
+    """
+    One loaded model version: its predictor, feature encoder and forecast
+    cube. Never modified once built; reloads and catalogue or provider
+    changes build a new one, so a request holding it always sees a
+    consistent model.
+    """
+
+    def __init__(self, name, predictor, encoder, checksum, cube=None):
+        self.name = name
+        self.predictor = predictor
+        self.encoder = encoder
+        self.X_columns = encoder.columns
+        self.checksum = checksum
+        self.cube = cube
 
 
 class ForecastingService:
-    _model = None
-    _X_columns = None
-    _stores = [s.value for s in Store]
+    _registry = None
+    # The version served when a request does not pin one, and every loaded
+    # version by name. Only replaced, never mutated, outside _load_lock.
+    _active = None
+    _resident = {}
+    _load_lock = threading.Lock()
+    _feature_provider = None
+    _catalogue = None
+    # Recent sales, only built once a model with demand features is loaded.
+    _demand = None
+    _demand_lock = threading.Lock()
+    # Whether a rebuild for a new demand version is waiting to run.
+    _demand_rebuild_pending = False
+    _cache = PredictionCache.from_env()
+
+    @classmethod
+    def get_registry(cls):
+        if cls._registry is None:
+            registry = ModelRegistry.from_env()
+            registry.ensure_seeded()
+            cls._registry = registry
+        return cls._registry
 
     @classmethod
     def get_model(cls):
-        if cls._model is None or cls._X_columns is None:
-            cls._model, cls._X_columns = load_model()
-        return cls._model, cls._X_columns
+        resident = cls.get_resident()
+        return resident.predictor, resident.X_columns
+
+    @classmethod
+    def get_resident(cls, version=None):
+        """
+        The loaded model for version, or for the active version if None.
+
+        Versions are loaded from the registry on first use and stay resident
+        (up to FORECAST_RESIDENT_VERSIONS of them) for later requests.
+        """
+        resident = cls._active if version is None else cls._resident.get(version)
+        if resident is not None:
+            return resident
+        with cls._load_lock:
+            if version is None:
+                if cls._active is None:
+                    cls._active = cls._add_resident(cls._load(None))
+                return cls._active
+            if version not in cls._resident:
+                cls._add_resident(cls._load(version))
+            return cls._resident[version]
+
+    @classmethod
+    def _load(cls, version):
+        with _unknown_model_version_as_404():
+            predictor, X_columns, metadata = cls.get_registry().load(
+                version, backend=os.environ.get("FORECAST_MODEL_BACKEND", "booster")
+            )
+        # Split the cores between the executor's concurrent predicts.
+        predictor.set_threads(forecast_executor.model_threads)
+        encoder = cls._encoder(X_columns)
+        return cls._with_cube(ResidentModel(metadata["version"], predictor, encoder, metadata["checksum"]))
+
+    @classmethod
+    def _encoder(cls, X_columns):
+        """Encoder for X_columns over the served catalogue, reading demand features from the store."""
+        catalogue = cls.get_catalogue()
+        encoder = FeatureEncoder(X_columns, catalogue)
+        if encoder.demand_columns:
+            demand = cls.get_demand_store(encoder).snapshot()
+            encoder = FeatureEncoder(X_columns, catalogue, demand)
+        return encoder
+
+    @classmethod
+    def _add_resident(cls, resident):
+        """Make resident available by name, evicting the oldest inactive versions. Hold _load_lock."""
+        limit = max(1, int(os.environ.get("FORECAST_RESIDENT_VERSIONS", 2)))
+        residents = {**cls._resident, resident.name: resident}
+        for name in list(residents):
+            if len(residents) <= limit:
+                break
+            if name != resident.name and (cls._active is None or name != cls._active.name):
+                del residents[name]
+        cls._resident = residents
+        cls._prune_cube_files()
+        return resident
+
+    @staticmethod
+    def cube_horizon():
+        """
+        Days of forecasts to precompute at model load (FORECAST_CUBE_DAYS,
+        0 disables) and the first of them (FORECAST_CUBE_START, default today).
+        """
+        days = int(os.environ.get("FORECAST_CUBE_DAYS", 0))
+        start = pd.Timestamp(os.environ.get("FORECAST_CUBE_START") or pd.Timestamp.today()).normalize()
+        return start, days
+
+    @classmethod
+    def _with_cube(cls, resident, encoder=None):
+        """A copy of resident, optionally with a new encoder, and a cube for the current feature provider."""
+        encoder = encoder or resident.encoder
+        cube = None
+        start, days = cls.cube_horizon()
+        if days > 0:
+            provider = cls.get_feature_provider()
+            cube = ForecastCube.materialize(
+                resident.predictor,
+                encoder,
+                provider,
+                version=(resident.checksum, provider.cache_key, encoder.demand_key),
+                start=start,
+                days=days,
+                stores=encoder.stores,
+                items=encoder.items,
+                directory=DIR_PATH,
+            )
+        return ResidentModel(resident.name, resident.predictor, encoder, resident.checksum, cube)
+
+    @classmethod
+    def reload_model(cls, version=None):
+        """
+        Load version (default: the registry's current one) from disk, check
+        it, then make it the active model in one assignment.
+
+        Requests keep using the previously active model until the swap, and
+        a version that fails its checksum or smoke prediction is never
+        swapped in. Cached predictions are keyed by model checksum, so they
+        stay valid for any version that is still resident.
+        """
+        resident = cls._load(version)
+        with cls._load_lock:
+            cls._active = cls._add_resident(resident)
+        return resident.name
+
+    @classmethod
+    def model_versions(cls):
+        """Registered versions, with which are loaded and which is active."""
+        registry = cls.get_registry()
+        default = registry.current()
+        active = cls._active.name if cls._active is not None else None
+        return [
+            {
+                "version": version,
+                "created_at": record["created_at"],
+                "checksum": record["checksum"],
+                "note": record.get("note"),
+                "default": version == default,
+                "resident": version in cls._resident,
+                "active": version == active,
+            }
+            for version in registry.versions()
+            for record in [registry.metadata(version)]
+        ]
+
+    @classmethod
+    def get_feature_provider(cls):
+        """
+        Exogenous feature source, chosen by FORECAST_FEATURE_PROVIDER
+        ("synthetic", "synthetic:<seed>", "climatology" or a weather table path).
+        """
+        if cls._feature_provider is None:
+            cls._feature_provider = make_feature_provider(
+                os.environ.get("FORECAST_FEATURE_PROVIDER", "synthetic")
+            )
+        return cls._feature_provider
+
+    @classmethod
+    def set_feature_provider(cls, provider):
+        with cls._load_lock:
+            cls._feature_provider = provider
+            cls._rebuild_residents()
+        cls._cache.clear()
+
+    @classmethod
+    def get_demand_store(cls, encoder):
+        """
+        Recent sales behind lag and rolling-mean features, built on first
+        use over the served catalogue (or encoder's stores and items).
+
+        It is seeded from FORECAST_DEMAND_HISTORY (a .csv or .parquet sales
+        history, default ml/historical_sales.csv, empty for none) and then
+        from the OUT stock transactions, which are attributed to
+        FORECAST_INVENTORY_STORE. Only the last few weeks are kept.
+        """
+        if cls._demand is None:
+            with cls._demand_lock:
+                if cls._demand is None:
+                    catalogue = cls.get_catalogue()
+                    if catalogue is None:
+                        demand = DemandFeatureStore(encoder.store_index, encoder.item_index)
+                    else:
+                        demand = DemandFeatureStore.from_catalogue(catalogue)
+                    cls._seed_demand(demand)
+                    cls._demand = demand
+        return cls._demand
+
+    @staticmethod
+    def _seed_demand(demand):
+        path = os.environ.get("FORECAST_DEMAND_HISTORY", os.path.join(DIR_PATH, "historical_sales.csv"))
+        if path:
+            columns = ['date', 'store_id', 'item_id', 'units_sold']
+            if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+                chunks = [pd.read_parquet(path, columns=columns)]
+            else:
+                chunks = pd.read_csv(path, usecols=columns, chunksize=100_000)
+            for df in chunks:
+                demand.add(df['date'], df['store_id'], df['item_id'], df['units_sold'])
+        store = os.environ.get("FORECAST_INVENTORY_STORE")
+        if store:
+            from ml.incremental_training import load_daily_sales
+
+            sales, _ = load_daily_sales(engine)
+            demand.add(sales['date'], [store] * len(sales), sales['item_id'], sales['units_sold'])
+
+    @classmethod
+    def tracks_demand(cls):
+        """Whether a demand feature store is loaded and wants stock transactions."""
+        return cls._demand is not None and bool(os.environ.get("FORECAST_INVENTORY_STORE"))
+
+    @classmethod
+    def record_sales(cls, items, units, timestamps):
+        """
+        Add OUT stock transactions of FORECAST_INVENTORY_STORE to the demand
+        feature store. A day's sales reach the features once a later day
+        begins; models using them are then re-encoded and their cubes
+        rebuilt in the background on the inference executor, and serve the
+        previous day's features until that is done.
+        """
+        if not cls.tracks_demand():
+            return
+        demand = cls._demand
+        version = demand.version
+        demand.add(timestamps, [os.environ["FORECAST_INVENTORY_STORE"]] * len(items), items, units)
+        if demand.version != version:
+            with cls._demand_lock:
+                if cls._demand_rebuild_pending:
+                    return
+                cls._demand_rebuild_pending = True
+            forecast_executor.spawn(cls._rebuild_for_demand)
+
+    @classmethod
+    def _rebuild_for_demand(cls):
+        with cls._demand_lock:
+            # Days closing from here on need another rebuild.
+            cls._demand_rebuild_pending = False
+        with cls._load_lock:
+            cls._rebuild_residents(demand_only=True)
+
+    @classmethod
+    def get_catalogue(cls):
+        """
+        Stores and items served, chosen by FORECAST_CATALOGUE: "default"
+        (ml/catalogue.json), "db" (the stores and catalogue_items tables),
+        "model" (whatever the model was trained on) or a catalogue file path.
+        Returns None for "model".
+        """
+        if cls._catalogue is None:
+            source = os.environ.get("FORECAST_CATALOGUE", "default")
+            cls._catalogue = False if source == "model" else load_catalogue(source, engine)
+        return cls._catalogue or None
+
+    @classmethod
+    def set_catalogue(cls, catalogue: Catalogue | None):
+        """Serve catalogue (None: the model's own stores and items) from now on."""
+        with cls._load_lock:
+            cls._catalogue = catalogue if catalogue is not None else False
+            cls._rebuild_residents()
+
+    @classmethod
+    def reload_catalogue(cls):
+        """Read the catalogue from its source again, e.g. after stores were added."""
+        cls._catalogue = None
+        catalogue = cls.get_catalogue()
+        cls.set_catalogue(catalogue)
+        return catalogue
 
-    def __init__(self):
-        self.model, self.X_columns = self.get_model()
+    @classmethod
+    def _rebuild_residents(cls, demand_only=False):
+        # Hold _load_lock. Rebuilds the encoders and cubes (only those with
+        # demand features if demand_only), then swaps them in.
+        cls._resident = {
+            name: cls._with_cube(r, cls._encoder(r.X_columns))
+            if r.encoder.demand_columns or not demand_only else r
+            for name, r in cls._resident.items()
+        }
+        if cls._active is not None:
+            cls._active = cls._resident[cls._active.name]
+        cls._prune_cube_files()
+
+    @classmethod
+    def _prune_cube_files(cls):
+        """
+        Delete every cube file no resident model uses, so files of past
+        days, swapped-out models and old feature providers do not pile up.
+        Runs at the first model load and whenever cubes are materialized.
+        """
+        ForecastCube.prune(DIR_PATH, [r.cube.path for r in cls._resident.values() if r.cube is not None])
+
+    @classmethod
+    def cache_stats(cls):
+        return cls._cache.stats()
+
+    @classmethod
+    def is_warm(cls):
+        """Whether the model is loaded, so a forecast will not pay for loading it."""
+        return cls._active is not None
+
+    def __init__(self, version=None):
+        resident = self.get_resident(version)
+        self.model_version = resident.name
+        self.model = resident.predictor
+        self.X_columns = resident.X_columns
+        self.encoder = resident.encoder
+        self.feature_provider = self.get_feature_provider()
+        self.version = (resident.checksum, self.feature_provider.cache_key, self.encoder.demand_key)
+        self.cube = resident.cube
+
+    def _predict_cells(self, dates, stores, items):
+        """
+        Raw predictions for parallel arrays of dates, stores and items.
+
+        Cells inside the materialized cube are read from it, others from the
+        prediction cache; the rest are encoded and scored together in one
+        model.predict call.
+        """
+        dates = pd.DatetimeIndex(dates)
+        stores = np.asarray(stores, dtype=object)
+        items = np.asarray(items, dtype=object)
+        predictions = np.full(len(dates), np.nan)
+        pending = np.arange(len(dates))
+        if self.cube is not None:
+            pending = np.flatnonzero(~self.cube.lookup(dates, stores, items, out=predictions))
+            if not len(pending):
+                return predictions
+
+        days = (dates[pending].normalize().asi8 // _NS_PER_DAY).tolist()
+        keys = [
+            (self.version, item, store, day)
+            for item, store, day in zip(items[pending].tolist(), stores[pending].tolist(), days)
+        ]
+        cached = self._cache.get_many(keys)
+        predictions[pending] = cached
 
-    def forecast_item_store_single_day(self, item: str, store: Store, date_str: str):
+        missing = np.flatnonzero(np.isnan(cached))
+        if len(missing):
+            rows = pending[missing]
+            with _unknown_category_as_400():
+                X = self.encoder.encode_rows(
+                    dates[rows], stores[rows], items[rows], self.feature_provider
+                )
+            scored = self.model.predict(X)
+            predictions[rows] = scored
+            self._cache.put_many([keys[i] for i in missing], scored.tolist())
+        return predictions
+
+    def _predict_grid(self, dates, stores, items):
+        keys = grid_keys(dates, stores, items)
+        block = self.cube.grid(dates, stores, items) if self.cube is not None else None
+        if block is not None:
+            keys['predicted_units'] = block.reshape(-1)
+        else:
+            keys['predicted_units'] = self._predict_cells(
+                keys['date'], keys['store_id'], keys['item_id']
+            )
+        return keys
+
+    def forecast_item_store_single_day(self, item: str, store: str, date_str: str):
         """
         Forecasts demand for a single item, in a single store on a specific day.
         """
-        return forecast_single(self.model, self.X_columns, item, store.value, date_str)
+        return self.forecast_batch([item], [store], [date_str])[0]
 
-    def forecast_monthly_demand_for_store(self, store: Store, year: int, month: int):
+    def forecast_monthly_demand_for_store(self, store: str, year: int, month: int):
         """
         Forecasts monthly demand for all items in a specific store.
         """
-        return forecast_monthly(self.model, self.X_columns, store.value, year, month)
+        return monthly_totals(self._predict_grid(month_dates(year, month), [store], self.encoder.items))
 
     def forecast_date_range(self, start_date: str, end_date: str):
         """
         Forecasts demand for all items and stores over a date range.
         """
-        return forecast_range(self.model, self.X_columns, start_date, end_date)
+        dates = pd.date_range(start=start_date, end=end_date)
+        return self._predict_grid(dates, self.encoder.stores, self.encoder.items)
+
+    def iter_date_range(self, start_date: str, end_date: str, chunk_days: int = 7):
+        """
+        Returns an iterator of forecast_date_range results a chunk of days at
+        a time, scoring each chunk only when the consumer asks for it. The
+        dates are parsed right away, so a bad range raises here rather than
+        once a streamed response has started.
+        """
+        dates = pd.date_range(start=start_date, end=end_date)
+        return (
+            self._predict_grid(dates[start:start + chunk_days], self.encoder.stores, self.encoder.items)
+            for start in range(0, len(dates), chunk_days)
+        )
+
+    def empty_date_range(self):
+        """A forecast_date_range result without rows, for its columns and dtypes."""
+        keys = grid_keys([], self.encoder.stores, self.encoder.items)
+        keys['predicted_units'] = np.empty(0)
+        return keys
+
+    def forecast_batch(self, items, stores, dates):
+        """
+        Forecasts demand for parallel lists of items, stores and dates
+        (YYYY-MM-DD) in a single model call.
+        """
+        predictions = self._predict_cells(pd.to_datetime(dates), stores, items)
+        predictions = np.rint(predictions).astype(int).tolist()
+        return [
+            {
+                'date': date_str,
+                'store': store,
+                'item': item,
+                'predicted_units_sold': prediction,
+            }
+            for item, store, date_str, prediction in zip(items, stores, dates, predictions)
+        ]
 
     def forecast_item_single_day_all_stores(self, item: str, date_str: str):
         """
         Forecasts demand for a single item across all stores on a specific day.
         """
-        results = []
-        for store in self._stores:
-            result = forecast_single(
-                self.model, self.X_columns, item, store, date_str
-            )
-            results.append(result)
-        return results
+        stores = self.encoder.stores
+        return self.forecast_batch([item] * len(stores), stores, [date_str] * len(stores))
@@ -0,0 +1,314 @@
+import asyncio
+import bisect
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from fastapi import HTTPException
+
+# Scheduling for forecast inference. Kept free of pandas/numpy/xgboost
+# imports so the API can start, and serve inventory routes, before the
+# forecasting stack has been loaded.
+
+
+def _saturated():
+    return HTTPException(
+        status_code=503,
+        detail="Forecast workers are saturated, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    rank = round(q / 100 * (len(sorted_values) - 1))
+    return float(sorted_values[rank])
+
+
+class InferenceExecutor:
+    """
+    Dedicated, size-bounded thread pool for forecast scoring.
+
+    XGBoost releases the GIL while predicting, so a few threads each
+    running a multi-threaded predict keep the cores busy without competing
+    with Starlette's default pool, which serves the inventory routes.
+    At most max_workers + max_queue tasks are accepted at once; beyond
+    that, run() fails fast with 503.
+
+    Only call run/submit/iterate from the event loop thread; the in-flight
+    counter is not locked.
+    """
+
+    _EXHAUSTED = object()
+
+    def __init__(self, max_workers=2, max_queue=32, model_threads=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.model_threads = model_threads or max(1, (os.cpu_count() or 1) // max_workers)
+        self.in_flight = 0
+        self.rejected = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="forecast")
+
+    @classmethod
+    def from_env(cls):
+        model_threads = os.environ.get("FORECAST_MODEL_THREADS")
+        return cls(
+            max_workers=int(os.environ.get("FORECAST_WORKERS", 2)),
+            max_queue=int(os.environ.get("FORECAST_QUEUE_DEPTH", 32)),
+            model_threads=int(model_threads) if model_threads else None,
+        )
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def check_capacity(self):
+        """Reject new work with 503 when every worker and queue slot is taken."""
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise _saturated()
+
+    async def submit(self, func, *args, **kwargs):
+        """Run func on the pool, without admission control."""
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, partial(func, *args, **kwargs))
+        finally:
+            self.in_flight -= 1
+
+    def spawn(self, func, *args, **kwargs):
+        """
+        Start func on the pool in the background, from any thread, without
+        admission control or waiting for it. For housekeeping, e.g.
+        rebuilding forecast cubes, that no request waits on.
+        """
+        return self._pool.submit(func, *args, **kwargs)
+
+    async def run(self, func, *args, **kwargs):
+        """Run func on the pool, or raise 503 if the executor is saturated."""
+        self.check_capacity()
+        return await self.submit(func, *args, **kwargs)
+
+    def iterate(self, iterator):
+        """
+        Advance a sync iterator on the pool, one item per task, for a
+        streamed response. The stream is admitted when this is called, so a
+        saturated executor answers 503 before the response starts, and it
+        holds one in-flight slot until it is exhausted, fails or is closed.
+        """
+        self.check_capacity()
+        return _Stream(self, iterator)
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "model_threads": self.model_threads,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+
+class _Stream:
+    """Async iterator of InferenceExecutor.iterate, holding its in-flight slot."""
+
+    def __init__(self, executor, iterator):
+        self._executor = executor
+        self._iterator = iterator
+        self._open = True
+        executor.in_flight += 1
+
+    def _release(self):
+        if self._open:
+            self._open = False
+            self._executor.in_flight -= 1
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._open:
+            raise StopAsyncIteration
+        loop = asyncio.get_running_loop()
+        try:
+            item = await loop.run_in_executor(
+                self._executor._pool, next, self._iterator, InferenceExecutor._EXHAUSTED
+            )
+        except BaseException:
+            self._release()
+            raise
+        if item is InferenceExecutor._EXHAUSTED:
+            self._release()
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self):
+        self._release()
+
+    def __del__(self):
+        # A response abandoned before it was iterated to the end.
+        self._release()
+
+
+forecast_executor = InferenceExecutor.from_env()
+
+
+class _Histogram:
+    """Counts of observed values per bucket; bucket i holds values <= bounds[i]."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def snapshot(self):
+        labels = [f"le_{bound:g}" for bound in self.bounds] + ["le_inf"]
+        return dict(zip(labels, self.counts))
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-cell forecasts into one forecast_batch call.
+
+    Requests arriving within window_ms of the first pending one, up to
+    max_batch of them, are scored together on the inference executor and
+    each caller's future is resolved with its own row. A row that fails
+    (e.g. an unknown item) only fails its own caller. At most max_queued
+    requests wait or are being scored at once (by default, full batches
+    for every executor slot); beyond that, forecast() fails fast with 503.
+
+    Like InferenceExecutor, only use it from the event loop thread.
+    """
+
+    LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    def __init__(self, executor, window_ms=3.0, max_batch=256, max_queued=None):
+        self.executor = executor
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.max_queued = max_queued or max_batch * executor.capacity
+        self.queued = 0
+        self.rejected = 0
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes = _Histogram([2 ** i for i in range(max_batch.bit_length())])
+        self.latency_ms = _Histogram(self.LATENCY_BUCKETS_MS)
+        self._recent_latencies = deque(maxlen=4096)
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    @classmethod
+    def from_env(cls, executor):
+        max_queued = os.environ.get("FORECAST_BATCH_MAX_QUEUED")
+        return cls(
+            executor,
+            window_ms=float(os.environ.get("FORECAST_BATCH_WINDOW_MS", 3)),
+            max_batch=int(os.environ.get("FORECAST_MAX_BATCH", 256)),
+            max_queued=int(max_queued) if max_queued else None,
+        )
+
+    @property
+    def enabled(self):
+        return self.window_ms > 0 and self.max_batch > 1
+
+    async def forecast(self, item: str, store: str, date_str: str, version: str | None = None):
+        """
+        Forecast one cell, sharing a model call with concurrent requests
+        for the same model version (None for the active one).
+        """
+        if self.queued >= self.max_queued:
+            self.rejected += 1
+            raise _saturated()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        started = time.perf_counter()
+        self.queued += 1
+        self._pending.append((item, store, date_str, version, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        try:
+            return await future
+        finally:
+            self.queued -= 1
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.requests += 1
+            self.latency_ms.observe(elapsed_ms)
+            self._recent_latencies.append(elapsed_ms)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        by_version = {}
+        for request in pending:
+            by_version.setdefault(request[3], []).append(request)
+        for version, batch in by_version.items():
+            self.batches += 1
+            self.batch_sizes.observe(len(batch))
+            task = asyncio.get_running_loop().create_task(self._score(version, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, version, batch):
+        rows = [request[:3] for request in batch]
+        try:
+            outcomes = await self.executor.submit(self._score_rows, rows, version)
+        except Exception as exc:
+            outcomes = [exc] * len(batch)
+        for (*_, future), outcome in zip(batch, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    @staticmethod
+    def _score_rows(rows, version=None):
+        # Runs on the executor, so the first batch also pays the forecasting
+        # stack's import there rather than on the event loop.
+        from services.forecasting import ForecastingService
+
+        service = ForecastingService(version)
+        items, stores, dates = (list(column) for column in zip(*rows))
+        try:
+            return service.forecast_batch(items, stores, dates)
+        except Exception:
+            if len(rows) == 1:
+                raise
+        # Some row is invalid; score rows one by one so only it fails.
+        outcomes = []
+        for item, store, date_str in rows:
+            try:
+                outcomes.append(service.forecast_batch([item], [store], [date_str])[0])
+            except Exception as exc:
+                outcomes.append(exc)
+        return outcomes
+
+    def stats(self):
+        latencies = sorted(self._recent_latencies) or [0.0]
+        return {
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch,
+            "max_queued": self.max_queued,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "requests": self.requests,
+            "batches": self.batches,
+            "p50_ms": _percentile(latencies, 50),
+            "p99_ms": _percentile(latencies, 99),
+            "batch_size_histogram": self.batch_sizes.snapshot(),
+            "latency_ms_histogram": self.latency_ms.snapshot(),
+        }
+
+
+forecast_batcher = MicroBatcher.from_env(forecast_executor)
@@ -1,9 +1,235 @@
+from datetime import datetime, timezone
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, delete, insert, select, update
 from models.database import InventoryItem, StockTransaction
-from models.schemas import InventoryItemCreate, UpdateItemSchema, StockTransactionCreate, StockAlert, InventoryStats
-from typing import List
+from models.schemas import (
+    InventoryItemCreate,
+    UpdateItemSchema,
+    StockTransactionCreate,
+    StockTransactionResponse,
+    StockTransactionBulkResponse,
+    StockTransactionBulkResult,
+    BulkMode,
+    StockAlert,
+    InventoryStats,
+)
+from services.inventory_stats import TOTALS, StatsChanges
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# Item ids per IN (...) query, well under SQLite's bound-parameter limit.
+IN_QUERY_BATCH = 500
+# Attempts at a compare-and-set stock update before giving up with 409.
+STOCK_UPDATE_RETRIES = 5
+
+# Statements and bookkeeping shared by InventoryService and
+# AsyncInventoryService, which differ only in how they run them.
+
+
+def _batches(ids):
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), IN_QUERY_BATCH):
+        yield ids[start:start + IN_QUERY_BATCH]
+
+
+def _stats_state(item: InventoryItem):
+    """What the inventory statistics count of an item: (current_stock, min_stock_threshold)."""
+    return item.current_stock, item.min_stock_threshold
+
+
+def _item_changes(item_id: int, before, after) -> StatsChanges:
+    changes = StatsChanges()
+    changes.add(item_id, before, after)
+    return changes
+
+
+def _update_item_if_unchanged(item_id: int, before, update_data: dict):
+    """
+    UPDATE applying update_data to the item. If it sets the stock or the
+    threshold, only while they are still before, so that the statistics
+    are adjusted from the values it actually replaces.
+    """
+    statement = update(InventoryItem).where(InventoryItem.id == item_id)
+    if {"current_stock", "min_stock_threshold"} & update_data.keys():
+        statement = statement.where(
+            InventoryItem.current_stock == before[0], InventoryItem.min_stock_threshold == before[1]
+        )
+    return statement.values(update_data).execution_options(synchronize_session=False)
+
+
+def _updated_state(before, update_data: dict):
+    return (
+        update_data.get("current_stock", before[0]),
+        update_data.get("min_stock_threshold", before[1]),
+    )
+
+
+def _delete_item(item_id: int):
+    return (
+        delete(InventoryItem)
+        .where(InventoryItem.id == item_id)
+        .returning(InventoryItem.current_stock, InventoryItem.min_stock_threshold)
+    )
+
+
+def _new_stock(current_stock: int, transaction_data: StockTransactionCreate) -> int | None:
+    """Stock level after the transaction, or None if there is not enough stock for it."""
+    if transaction_data.transaction_type == "IN":
+        return current_stock + transaction_data.quantity
+    if transaction_data.transaction_type == "OUT":
+        new_stock = current_stock - transaction_data.quantity
+        return new_stock if new_stock >= 0 else None
+    return transaction_data.quantity  # ADJUSTMENT
+
+
+def _adjust_if_unchanged(item_id: int, previous_stock: int, quantity: int, now: datetime):
+    """UPDATE setting the item's stock to quantity if it is still previous_stock."""
+    return (
+        update(InventoryItem)
+        .where(InventoryItem.id == item_id, InventoryItem.current_stock == previous_stock)
+        .values(current_stock=quantity, updated_at=now)
+        .returning(InventoryItem.min_stock_threshold)
+    )
+
+
+def _move_stock(transaction_data: StockTransactionCreate, now: datetime):
+    """Conditional UPDATE ... RETURNING the new stock and the threshold of an IN or OUT movement."""
+    stock = InventoryItem.current_stock
+    quantity = transaction_data.quantity
+    if transaction_data.transaction_type == "IN":
+        statement = update(InventoryItem).where(InventoryItem.id == transaction_data.item_id).values(
+            current_stock=stock + quantity, updated_at=now
+        )
+    else:  # OUT
+        statement = update(InventoryItem).where(
+            InventoryItem.id == transaction_data.item_id, stock >= quantity
+        ).values(current_stock=stock - quantity, updated_at=now)
+    return statement.returning(stock, InventoryItem.min_stock_threshold)
+
+
+def _moved(transaction_data: StockTransactionCreate, new_stock: int, threshold: int):
+    """(previous, new) stock and threshold of an IN or OUT movement that left new_stock."""
+    if transaction_data.transaction_type == "IN":
+        return new_stock - transaction_data.quantity, new_stock, threshold
+    return new_stock + transaction_data.quantity, new_stock, threshold
+
+
+def _ledger_entry(transaction_data: StockTransactionCreate, previous_stock: int, new_stock: int, now: datetime):
+    return StockTransaction(
+        item_id=transaction_data.item_id,
+        transaction_type=transaction_data.transaction_type,
+        quantity=transaction_data.quantity,
+        previous_stock=previous_stock,
+        new_stock=new_stock,
+        reason=transaction_data.reason,
+        performed_by=transaction_data.performed_by,
+        timestamp=now,
+    )
+
+
+def _plan_bulk(transactions: List[StockTransactionCreate], stock: Dict[int, int], now: datetime):
+    """
+    Apply transactions in order to the stock levels in stock (updated in
+    place), returning the result of each and the ledger rows of those
+    that succeeded.
+    """
+    results = []
+    rows = []
+    for index, transaction_data in enumerate(transactions):
+        previous_stock = stock.get(transaction_data.item_id)
+        if previous_stock is None:
+            results.append(StockTransactionBulkResult(index=index, success=False, error="Item not found"))
+            continue
+        new_stock = _new_stock(previous_stock, transaction_data)
+        if new_stock is None:
+            results.append(
+                StockTransactionBulkResult(index=index, success=False, error="Insufficient stock")
+            )
+            continue
+        stock[transaction_data.item_id] = new_stock
+        rows.append({
+            "item_id": transaction_data.item_id,
+            "transaction_type": transaction_data.transaction_type.value,
+            "quantity": transaction_data.quantity,
+            "previous_stock": previous_stock,
+            "new_stock": new_stock,
+            "reason": transaction_data.reason,
+            "performed_by": transaction_data.performed_by,
+            "timestamp": now,
+            "created_at": now,
+            "updated_at": now,
+        })
+        results.append(StockTransactionBulkResult(index=index, success=True))
+    return results, rows
+
+
+def _set_stock_if_unchanged(batch: List[int], seen: Dict[int, int], new: Dict[int, int], now: datetime):
+    """
+    UPDATE setting the stock of each item in batch to new[id] if it is
+    still seen[id], returning the id and threshold of those it set.
+    """
+    return (
+        update(InventoryItem)
+        .where(
+            InventoryItem.id.in_(batch),
+            InventoryItem.current_stock == case({i: seen[i] for i in batch}, value=InventoryItem.id),
+        )
+        .values(current_stock=case({i: new[i] for i in batch}, value=InventoryItem.id), updated_at=now)
+        .returning(InventoryItem.id, InventoryItem.min_stock_threshold)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _bulk_changes(seen: Dict[int, int], new: Dict[int, int], thresholds: Dict[int, int]) -> StatsChanges:
+    changes = StatsChanges()
+    for item_id, threshold in thresholds.items():
+        changes.add(item_id, (seen[item_id], threshold), (new[item_id], threshold))
+    return changes
+
+
+def _insert_ledger_rows(dialect):
+    """
+    INSERT ... RETURNING id for a list of ledger rows, and a function
+    putting the returned ids in the order of the rows.
+
+    SQLAlchemy batches such an insert into multi-row statements only if it
+    can match returned rows to parameters, which it cannot on SQLite: there
+    it would run one statement per row. SQLite hands out increasing rowids
+    within a statement instead, so the batched ids are sorted.
+    """
+    if dialect.name == "sqlite":
+        return insert(StockTransaction).returning(StockTransaction.id), sorted
+    return insert(StockTransaction).returning(StockTransaction.id, sort_by_parameter_order=True), list
+
+
+def _rejected_bulk(transactions, results, mode: BulkMode) -> StockTransactionBulkResponse:
+    for result in results:
+        if result.success:
+            result.success = False
+            result.error = "Not applied: another transaction in the batch failed"
+    return StockTransactionBulkResponse(
+        mode=mode, committed=False, succeeded=0, failed=len(transactions), results=results
+    )
+
+
+def _committed_bulk(transactions, results, rows, ids, mode: BulkMode) -> StockTransactionBulkResponse:
+    applied = iter(zip(ids, rows))
+    for result in results:
+        if result.success:
+            transaction_id, row = next(applied)
+            # The timestamp column is naive UTC; report it the way a single
+            # transaction, read back from the database, reports it.
+            timestamp = row["timestamp"].replace(tzinfo=None)
+            result.transaction = StockTransactionResponse(
+                id=transaction_id, **{**row, "timestamp": timestamp}
+            )
+    return StockTransactionBulkResponse(
+        mode=mode, committed=True, succeeded=len(rows), failed=len(transactions) - len(rows), results=results
+    )
+
 
 class InventoryService:
     """Service for managing inventory operations."""
@@ -11,6 +237,11 @@ class InventoryService:
     def __init__(self, db: Session):
         self.db = db
 
+    def _apply_stats(self, changes: StatsChanges):
+        """Add changes to the inventory statistics, in the current transaction."""
+        for statement in changes.statements():
+            self.db.execute(statement)
+
     def _get_item_or_404(self, item_id: int):
         """Helper method to get an item or raise 404 if not found."""
         item = self.db.query(InventoryItem).filter(InventoryItem.id == item_id).first()
@@ -36,6 +267,8 @@ class InventoryService:
 
         new_item = InventoryItem(**item_data.model_dump())
         self.db.add(new_item)
+        self.db.flush()
+        self._apply_stats(_item_changes(new_item.id, None, _stats_state(new_item)))
         self.db.commit()
         self.db.refresh(new_item)
         return new_item
@@ -44,72 +277,169 @@ class InventoryService:
         """Get an inventory item by ID."""
         return self._get_item_or_404(item_id)
 
+    def get_items(self, item_ids: Iterable[int]) -> Dict[int, InventoryItem]:
+        """Get the items with the given IDs by ID, with one IN (...) query per batch of IDs."""
+        items = {}
+        for batch in _batches(item_ids):
+            for item in self.db.query(InventoryItem).filter(InventoryItem.id.in_(batch)):
+                items[item.id] = item
+        return items
+
     def list_items(self, skip: int = 0, limit: int = 100) -> List[InventoryItem]:
         """List inventory items with pagination."""
         return self.db.query(InventoryItem).offset(skip).limit(limit).all()
 
     def update_item(self, item_id: int, item_data: UpdateItemSchema) -> InventoryItem:
         """Update an inventory item."""
-        item = self._get_item_or_404(item_id)
-        
         # Filter out None values to only update provided fields
         update_data = {
             key: value for key, value in item_data.model_dump().items()
             if value is not None
         }
-        
-        # If walmart_item_id is being updated, check uniqueness
-        if "walmart_item_id" in update_data and update_data["walmart_item_id"] != item.walmart_item_id:
-            self._check_unique_walmart_id(update_data["walmart_item_id"])
 
-        for key, value in update_data.items():
-            setattr(item, key, value)
+        for _ in range(STOCK_UPDATE_RETRIES):
+            item = self._get_item_or_404(item_id)
+            if not update_data:
+                return item
 
-        self.db.commit()
-        self.db.refresh(item)
-        return item
+            # If walmart_item_id is being updated, check uniqueness
+            if "walmart_item_id" in update_data and update_data["walmart_item_id"] != item.walmart_item_id:
+                self._check_unique_walmart_id(update_data["walmart_item_id"])
+
+            before = _stats_state(item)
+            if self.db.execute(_update_item_if_unchanged(item_id, before, update_data)).rowcount:
+                self._apply_stats(_item_changes(item_id, before, _updated_state(before, update_data)))
+                self.db.commit()
+                self.db.refresh(item)
+                return item
+            # Changed (or deleted) since it was read: read it again.
+            self.db.rollback()
+        raise HTTPException(status_code=409, detail="Item changed concurrently; retry the update")
 
     def delete_item(self, item_id: int):
         """Delete an inventory item."""
-        item = self._get_item_or_404(item_id)
-        self.db.delete(item)
+        deleted = self.db.execute(_delete_item(item_id)).first()
+        if deleted is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        self._apply_stats(_item_changes(item_id, tuple(deleted), None))
         self.db.commit()
 
-    def create_transaction(self, transaction_data: StockTransactionCreate) -> StockTransaction:
-        """Create a stock transaction and update inventory."""
-        item = self._get_item_or_404(transaction_data.item_id)
-        
-        # Calculate new stock level
-        new_stock = item.current_stock
-        if transaction_data.transaction_type == "IN":
-            new_stock += transaction_data.quantity
-        elif transaction_data.transaction_type == "OUT":
-            new_stock -= transaction_data.quantity
-            if new_stock < 0:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Cannot process transaction: Insufficient stock"
+    def _apply_movement(self, transaction_data: StockTransactionCreate, now: datetime):
+        """
+        Change the item's stock in the database and return the previous and
+        new stock and the item's threshold, or raise 404/400.
+
+        IN and OUT are one conditional UPDATE ... RETURNING: the database
+        does the arithmetic and the stock check on the row it locks, so
+        concurrent movements of an item are applied one after another and
+        none is lost. ADJUSTMENT needs the previous level for the ledger,
+        so it is a compare-and-set on the level just read, retried if
+        another writer got in between.
+        """
+        item_id = transaction_data.item_id
+        if transaction_data.transaction_type == "ADJUSTMENT":
+            quantity = transaction_data.quantity
+            for _ in range(STOCK_UPDATE_RETRIES):
+                previous_stock = self.db.scalar(
+                    select(InventoryItem.current_stock).where(InventoryItem.id == item_id)
                 )
-        else:  # ADJUSTMENT
-            new_stock = transaction_data.quantity
+                if previous_stock is None:
+                    raise HTTPException(status_code=404, detail="Item not found")
+                adjusted = self.db.execute(_adjust_if_unchanged(item_id, previous_stock, quantity, now)).first()
+                if adjusted is not None:
+                    return previous_stock, quantity, adjusted.min_stock_threshold
+            raise HTTPException(status_code=409, detail="Stock changed concurrently; retry the transaction")
 
-        # Create transaction record
-        transaction = StockTransaction(
-            item_id=item.id,
-            transaction_type=transaction_data.transaction_type,
-            quantity=transaction_data.quantity,
-            previous_stock=item.current_stock,
-            new_stock=new_stock,
-            reason=transaction_data.reason,
-            performed_by=transaction_data.performed_by
+        moved = self.db.execute(_move_stock(transaction_data, now)).first()
+        if moved is None:
+            self._get_item_or_404(item_id)
+            raise HTTPException(
+                status_code=400,
+                detail="Cannot process transaction: Insufficient stock"
+            )
+        return _moved(transaction_data, *moved)
+
+    def create_transaction(self, transaction_data: StockTransactionCreate) -> StockTransaction:
+        """Create a stock transaction and update inventory, atomically with respect to other writers."""
+        now = datetime.now(timezone.utc)
+        try:
+            previous_stock, new_stock, threshold = self._apply_movement(transaction_data, now)
+        except HTTPException:
+            self.db.rollback()
+            raise
+        self._apply_stats(
+            _item_changes(transaction_data.item_id, (previous_stock, threshold), (new_stock, threshold))
         )
 
+        # Create transaction record
+        transaction = _ledger_entry(transaction_data, previous_stock, new_stock, now)
+
         self.db.add(transaction)
-        item.current_stock = new_stock
         self.db.commit()
         self.db.refresh(transaction)
         return transaction
 
+    def _set_stock_if_unchanged(self, ids, seen: Dict[int, int], new: Dict[int, int], now: datetime):
+        """
+        Set the stock of each item in ids to new[id] if it is still seen[id],
+        one UPDATE per batch of items, and return their thresholds by id.
+        Batches go in ascending id order, so concurrent bulk requests lock
+        the rows they share in the same order and cannot deadlock.
+        Returns None, having changed nothing the caller should keep, if
+        another writer changed any of them first.
+
+        Items whose movements cancel out are checked too, since their
+        ledger rows record the stock levels seen.
+        """
+        thresholds = {}
+        for batch in _batches(ids):
+            updated = self.db.execute(_set_stock_if_unchanged(batch, seen, new, now)).all()
+            if len(updated) != len(batch):
+                return None
+            thresholds.update(updated)
+        return thresholds
+
+    def create_transactions_bulk(
+        self, transactions: List[StockTransactionCreate], mode: BulkMode = BulkMode.ATOMIC
+    ) -> StockTransactionBulkResponse:
+        """
+        Create many stock transactions in one database transaction.
+
+        The referenced items are loaded together and the movements applied
+        in list order in memory, so each stock check sees the earlier
+        movements of the batch. The new stock levels are then written with
+        a compare-and-set on the levels read, the transactions with one
+        bulk insert, and everything committed once; if a concurrent writer
+        changed one of the items meanwhile, the batch is planned again. In
+        ATOMIC mode a single failure rejects the whole batch; in
+        BEST_EFFORT mode the failed transactions are skipped and the rest
+        applied.
+        """
+        for _ in range(STOCK_UPDATE_RETRIES):
+            now = datetime.now(timezone.utc)
+            items = self.get_items(t.item_id for t in transactions)
+            seen = {item_id: item.current_stock for item_id, item in items.items()}
+            stock = dict(seen)
+            results, rows = _plan_bulk(transactions, stock, now)
+            if mode == BulkMode.ATOMIC and len(rows) < len(transactions):
+                self.db.rollback()
+                return _rejected_bulk(transactions, results, mode)
+            thresholds = self._set_stock_if_unchanged(
+                sorted({row["item_id"] for row in rows}), seen, stock, now
+            )
+            if thresholds is None:
+                self.db.rollback()
+                continue
+            self._apply_stats(_bulk_changes(seen, stock, thresholds))
+
+            ids = []
+            if rows:
+                statement, in_row_order = _insert_ledger_rows(self.db.get_bind().dialect)
+                ids = in_row_order(self.db.scalars(statement, rows))
+            self.db.commit()
+            return _committed_bulk(transactions, results, rows, ids, mode)
+        raise HTTPException(status_code=409, detail="Stock changed concurrently; retry the batch")
+
     def get_low_stock_items(self, skip: int = 0, limit: int = 100) -> List[InventoryItem]:
         """Get items where current stock is below the minimum threshold."""
         return (
@@ -121,23 +451,190 @@ class InventoryService:
         )
 
     def get_inventory_stats(self) -> InventoryStats:
-        """Get inventory statistics."""
-        total_items = self.db.query(func.count(InventoryItem.id)).scalar()
-        total_stock = self.db.query(func.sum(InventoryItem.current_stock)).scalar() or 0
-        low_stock_items = (
-            self.db.query(func.count(InventoryItem.id))
-            .filter(InventoryItem.current_stock < InventoryItem.min_stock_threshold)
-            .scalar()
-        )
-        out_of_stock_items = (
-            self.db.query(func.count(InventoryItem.id))
-            .filter(InventoryItem.current_stock == 0)
-            .scalar()
+        """Get inventory statistics, from the totals every write keeps up to date (see inventory_stats.py)."""
+        return InventoryStats(**self.db.execute(TOTALS).one()._mapping)
+
+
+class AsyncInventoryService:
+    """
+    InventoryService on an AsyncSession: the same operations, with the same
+    results and errors, as coroutines. The async API routes use it, so a
+    request waiting on the database holds no thread.
+    """
+
+    def __init__(self, db: "AsyncSession"):
+        self.db = db
+
+    async def _apply_stats(self, changes: StatsChanges):
+        for statement in changes.statements():
+            await self.db.execute(statement)
+
+    async def _get_item_or_404(self, item_id: int):
+        item = await self.db.scalar(select(InventoryItem).where(InventoryItem.id == item_id))
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return item
+
+    async def _check_unique_walmart_id(self, walmart_item_id: str):
+        existing_id = await self.db.scalar(
+            select(InventoryItem.id).where(InventoryItem.walmart_item_id == walmart_item_id).limit(1)
         )
+        if existing_id is not None:
+            raise HTTPException(
+                status_code=400, detail="Walmart item ID must be unique"
+            )
+
+    async def create_item(self, item_data: InventoryItemCreate) -> InventoryItem:
+        """Create a new inventory item."""
+        await self._check_unique_walmart_id(item_data.walmart_item_id)
+
+        new_item = InventoryItem(**item_data.model_dump())
+        self.db.add(new_item)
+        await self.db.flush()
+        await self._apply_stats(_item_changes(new_item.id, None, _stats_state(new_item)))
+        await self.db.commit()
+        await self.db.refresh(new_item)
+        return new_item
+
+    async def get_item(self, item_id: int) -> InventoryItem:
+        """Get an inventory item by ID."""
+        return await self._get_item_or_404(item_id)
+
+    async def get_items(self, item_ids: Iterable[int]) -> Dict[int, InventoryItem]:
+        """Get the items with the given IDs by ID, with one IN (...) query per batch of IDs."""
+        items = {}
+        for batch in _batches(item_ids):
+            for item in await self.db.scalars(select(InventoryItem).where(InventoryItem.id.in_(batch))):
+                items[item.id] = item
+        return items
 
-        return InventoryStats(
-            total_items=total_items,
-            total_stock=total_stock,
-            low_stock_items=low_stock_items,
-            out_of_stock_items=out_of_stock_items,
+    async def list_items(self, skip: int = 0, limit: int = 100) -> List[InventoryItem]:
+        """List inventory items with pagination."""
+        return list(await self.db.scalars(select(InventoryItem).offset(skip).limit(limit)))
+
+    async def update_item(self, item_id: int, item_data: UpdateItemSchema) -> InventoryItem:
+        """Update an inventory item."""
+        update_data = {
+            key: value for key, value in item_data.model_dump().items()
+            if value is not None
+        }
+        for _ in range(STOCK_UPDATE_RETRIES):
+            item = await self._get_item_or_404(item_id)
+            if not update_data:
+                return item
+            if "walmart_item_id" in update_data and update_data["walmart_item_id"] != item.walmart_item_id:
+                await self._check_unique_walmart_id(update_data["walmart_item_id"])
+
+            before = _stats_state(item)
+            result = await self.db.execute(_update_item_if_unchanged(item_id, before, update_data))
+            if result.rowcount:
+                await self._apply_stats(_item_changes(item_id, before, _updated_state(before, update_data)))
+                await self.db.commit()
+                await self.db.refresh(item)
+                return item
+            await self.db.rollback()
+        raise HTTPException(status_code=409, detail="Item changed concurrently; retry the update")
+
+    async def delete_item(self, item_id: int):
+        """Delete an inventory item."""
+        deleted = (await self.db.execute(_delete_item(item_id))).first()
+        if deleted is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        await self._apply_stats(_item_changes(item_id, tuple(deleted), None))
+        await self.db.commit()
+
+    async def _apply_movement(self, transaction_data: StockTransactionCreate, now: datetime):
+        """See InventoryService._apply_movement."""
+        item_id = transaction_data.item_id
+        if transaction_data.transaction_type == "ADJUSTMENT":
+            quantity = transaction_data.quantity
+            for _ in range(STOCK_UPDATE_RETRIES):
+                previous_stock = await self.db.scalar(
+                    select(InventoryItem.current_stock).where(InventoryItem.id == item_id)
+                )
+                if previous_stock is None:
+                    raise HTTPException(status_code=404, detail="Item not found")
+                result = await self.db.execute(_adjust_if_unchanged(item_id, previous_stock, quantity, now))
+                adjusted = result.first()
+                if adjusted is not None:
+                    return previous_stock, quantity, adjusted.min_stock_threshold
+            raise HTTPException(status_code=409, detail="Stock changed concurrently; retry the transaction")
+
+        moved = (await self.db.execute(_move_stock(transaction_data, now))).first()
+        if moved is None:
+            await self._get_item_or_404(item_id)
+            raise HTTPException(
+                status_code=400,
+                detail="Cannot process transaction: Insufficient stock"
+            )
+        return _moved(transaction_data, *moved)
+
+    async def create_transaction(self, transaction_data: StockTransactionCreate) -> StockTransaction:
+        """Create a stock transaction and update inventory, atomically with respect to other writers."""
+        now = datetime.now(timezone.utc)
+        try:
+            previous_stock, new_stock, threshold = await self._apply_movement(transaction_data, now)
+        except HTTPException:
+            await self.db.rollback()
+            raise
+        await self._apply_stats(
+            _item_changes(transaction_data.item_id, (previous_stock, threshold), (new_stock, threshold))
         )
+
+        transaction = _ledger_entry(transaction_data, previous_stock, new_stock, now)
+        self.db.add(transaction)
+        await self.db.commit()
+        await self.db.refresh(transaction)
+        return transaction
+
+    async def _set_stock_if_unchanged(self, ids, seen: Dict[int, int], new: Dict[int, int], now: datetime):
+        """See InventoryService._set_stock_if_unchanged."""
+        thresholds = {}
+        for batch in _batches(ids):
+            updated = (await self.db.execute(_set_stock_if_unchanged(batch, seen, new, now))).all()
+            if len(updated) != len(batch):
+                return None
+            thresholds.update(updated)
+        return thresholds
+
+    async def create_transactions_bulk(
+        self, transactions: List[StockTransactionCreate], mode: BulkMode = BulkMode.ATOMIC
+    ) -> StockTransactionBulkResponse:
+        """Create many stock transactions in one database transaction; see InventoryService."""
+        for _ in range(STOCK_UPDATE_RETRIES):
+            now = datetime.now(timezone.utc)
+            items = await self.get_items(t.item_id for t in transactions)
+            seen = {item_id: item.current_stock for item_id, item in items.items()}
+            stock = dict(seen)
+            results, rows = _plan_bulk(transactions, stock, now)
+            if mode == BulkMode.ATOMIC and len(rows) < len(transactions):
+                await self.db.rollback()
+                return _rejected_bulk(transactions, results, mode)
+            thresholds = await self._set_stock_if_unchanged(
+                sorted({row["item_id"] for row in rows}), seen, stock, now
+            )
+            if thresholds is None:
+                await self.db.rollback()
+                continue
+            await self._apply_stats(_bulk_changes(seen, stock, thresholds))
+
+            ids = []
+            if rows:
+                statement, in_row_order = _insert_ledger_rows(self.db.get_bind().dialect)
+                ids = in_row_order(await self.db.scalars(statement, rows))
+            await self.db.commit()
+            return _committed_bulk(transactions, results, rows, ids, mode)
+        raise HTTPException(status_code=409, detail="Stock changed concurrently; retry the batch")
+
+    async def get_low_stock_items(self, skip: int = 0, limit: int = 100) -> List[InventoryItem]:
+        """Get items where current stock is below the minimum threshold."""
+        return list(await self.db.scalars(
+            select(InventoryItem)
+            .where(InventoryItem.current_stock < InventoryItem.min_stock_threshold)
+            .offset(skip)
+            .limit(limit)
+        ))
+
+    async def get_inventory_stats(self) -> InventoryStats:
+        """Get inventory statistics, from the totals every write keeps up to date (see inventory_stats.py)."""
+        return InventoryStats(**(await self.db.execute(TOTALS)).one()._mapping)
@@ -0,0 +1,166 @@
+from collections import defaultdict
+
+from sqlalchemy import case, delete, func, insert, select, true, update
+from sqlalchemy.exc import IntegrityError
+
+from models.database import InventoryItem, InventoryStatsShard
+
+# Inventory statistics kept in the inventory_stats table instead of
+# aggregated over inventory_items on every request. Each write adds its
+# change to the totals in the same database transaction, so the totals
+# commit or roll back with it.
+
+# Rows of inventory_stats; an item's changes go to shard item_id % STATS_SHARDS.
+# Startup rebuilds the table when its rows do not match.
+STATS_SHARDS = 16
+FIELDS = ("total_items", "total_stock", "low_stock_items", "out_of_stock_items")
+
+TOTALS = select(*(func.coalesce(func.sum(getattr(InventoryStatsShard, field)), 0).label(field) for field in FIELDS))
+
+
+def _item_aggregates():
+    """FIELDS as aggregates over inventory_items, as get_inventory_stats used to query them."""
+    return (
+        func.count(InventoryItem.id),
+        func.coalesce(func.sum(InventoryItem.current_stock), 0),
+        func.count(case((InventoryItem.current_stock < InventoryItem.min_stock_threshold, 1))),
+        func.count(case((InventoryItem.current_stock == 0, 1))),
+    )
+
+
+def _counts(state):
+    """An item's share of each of FIELDS, given its (current_stock, min_stock_threshold) or None."""
+    if state is None:
+        return (0,) * len(FIELDS)
+    stock, threshold = state
+    return (
+        1,
+        stock or 0,
+        int(stock is not None and threshold is not None and stock < threshold),
+        int(stock == 0),
+    )
+
+
+class StatsChanges:
+    """
+    The changes one database transaction makes to the totals, per shard.
+
+    Writers record each item they change with its (current_stock,
+    min_stock_threshold) before and after, None for an item that did not
+    exist before or no longer does, and execute statements() before
+    committing. The before state must be the one the write replaced, e.g.
+    returned by or checked in its UPDATE, or the totals drift.
+    """
+
+    def __init__(self):
+        self._shards = defaultdict(lambda: [0] * len(FIELDS))
+
+    def add(self, item_id, before, after):
+        deltas = self._shards[item_id % STATS_SHARDS]
+        for i, (new, old) in enumerate(zip(_counts(after), _counts(before))):
+            deltas[i] += new - old
+
+    def statements(self):
+        """
+        One relative UPDATE per changed shard, in shard order so that
+        concurrent writers lock the rows in the same order.
+        """
+        for shard, deltas in sorted(self._shards.items()):
+            values = {
+                field: getattr(InventoryStatsShard, field) + delta for field, delta in zip(FIELDS, deltas) if delta
+            }
+            if values:
+                yield update(InventoryStatsShard).where(InventoryStatsShard.shard == shard).values(values)
+
+
+def rebuild(connection):
+    """
+    Recompute every shard from inventory_items, in the caller's transaction.
+
+    The shard rows are locked first and updated in place, so a writer
+    that has changed an item but not yet its shard waits, then adds its
+    change to the recomputed totals.
+    """
+    connection.execute(update(InventoryStatsShard).values(shard=InventoryStatsShard.shard))
+    shard = (InventoryItem.id % STATS_SHARDS).label("shard")
+    recomputed = {row[0]: row[1:] for row in connection.execute(select(shard, *_item_aggregates()).group_by(shard))}
+    existing = set(connection.scalars(select(InventoryStatsShard.shard)))
+    rows = [{"shard": k, **dict(zip(FIELDS, recomputed.get(k, (0,) * len(FIELDS))))} for k in range(STATS_SHARDS)]
+    for row in rows:
+        if row["shard"] in existing:
+            connection.execute(
+                update(InventoryStatsShard).where(InventoryStatsShard.shard == row["shard"]).values(row)
+            )
+    missing = [row for row in rows if row["shard"] not in existing]
+    if missing:
+        connection.execute(insert(InventoryStatsShard), missing)
+    connection.execute(delete(InventoryStatsShard).where(InventoryStatsShard.shard >= STATS_SHARDS))
+
+
+def ensure_inventory_stats(engine):
+    """
+    Build inventory_stats from inventory_items if its rows are missing,
+    e.g. on the first start after upgrading, or were made for another
+    STATS_SHARDS. Returns whether it did.
+    """
+    with engine.connect() as connection:
+        shards = set(connection.scalars(select(InventoryStatsShard.shard)))
+    if shards == set(range(STATS_SHARDS)):
+        return False
+    try:
+        with engine.begin() as connection:
+            rebuild(connection)
+    except IntegrityError:
+        # Another worker built them at the same time.
+        pass
+    return True
+
+
+def check(connection):
+    """
+    The stored totals next to ones recomputed from inventory_items, read
+    with one statement so both see the same state of the database.
+
+    Returns:
+        Dict of field -> (stored, recomputed).
+    """
+    stored = TOTALS.subquery()
+    recomputed = select(
+        *(aggregate.label(field) for field, aggregate in zip(FIELDS, _item_aggregates()))
+    ).subquery()
+    row = connection.execute(
+        select(*(stored.c[field] for field in FIELDS), *(recomputed.c[field] for field in FIELDS))
+        .select_from(stored.join(recomputed, true()))
+    ).one()
+    return {field: (row[i], row[len(FIELDS) + i]) for i, field in enumerate(FIELDS)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from models.database import engine, init_db
+
+    parser = argparse.ArgumentParser(
+        description="Compare the stored inventory statistics with ones recomputed from the items."
+    )
+    parser.add_argument("--fix", action="store_true", help="Rebuild the statistics if they drifted")
+    args = parser.parse_args()
+
+    init_db()
+    ensure_inventory_stats(engine)
+    with engine.connect() as connection:
+        report = check(connection)
+    drifted = {field: values for field, values in report.items() if values[0] != values[1]}
+    print(f"{'field':<20}{'stored':>14}{'recomputed':>14}{'drift':>10}")
+    for field, (stored, recomputed) in report.items():
+        print(f"{field:<20}{stored:>14}{recomputed:>14}{stored - recomputed:>+10}")
+    if not drifted:
+        print("✅ Inventory statistics are consistent")
+    elif args.fix:
+        with engine.begin() as connection:
+            rebuild(connection)
+        print(f"✅ Rebuilt inventory statistics ({len(drifted)} fields had drifted)")
+    else:
+        print(f"❌ {len(drifted)} fields drifted; rebuild with --fix")
+        sys.exit(1)
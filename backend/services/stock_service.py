@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from models.database import StockTransaction, InventoryItem
-from models.schemas import StockTransactionCreate, StockTransactionResponse
+from models.schemas import BulkMode, StockTransactionCreate, StockTransactionResponse
+from services.inventory import InventoryService
 from typing import List
 from fastapi import HTTPException
 
@@ -39,11 +40,12 @@ class StockService:
         return [StockTransactionResponse.from_orm(tx) for tx in transactions]
 
     def bulk_stock_update(self, updates: List[StockTransactionCreate]) -> List[StockTransactionResponse]:
-        responses = []
-        for update in updates:
-            response = self.update_stock(update.item_id, update)
-            responses.append(response)
-        return responses
+        # One query for the items, one bulk insert and one commit, all or nothing.
+        result = InventoryService(self.db).create_transactions_bulk(updates, BulkMode.ATOMIC)
+        if not result.committed:
+            failure = next(r for r in result.results if r.error and not r.error.startswith("Not applied"))
+            raise HTTPException(status_code=400, detail=f"Transaction {failure.index}: {failure.error}")
+        return [r.transaction for r in result.results]
 
     def get_recent_transactions(self, limit: int) -> List[StockTransactionResponse]:
         transactions = self.db.query(StockTransaction).order_by(StockTransaction.created_at.desc()).limit(limit).all()